@@ -0,0 +1,185 @@
+"""
+Opening book in Polyglot format.
+Book is a file of 16 byte entries (key, move, weight, learn) in big endian
+sorted by key. Key is the Polyglot hash of position, which is the zobrist
+hash of Board, so moves are found by binary search in file mapped to
+memory without generating any move.
+"""
+#!/bin/python3
+import argparse
+import mmap
+import random
+import struct
+from chess import figures
+from chess.board import Board
+
+# Entry: key, move, weight, learn
+ENTRY = struct.Struct('>QHHI')
+# Promotion types stored in move (0 is no promotion)
+PROMOTIONS = (None, figures.figure.KNIGHT, figures.figure.BISHOP,
+              figures.figure.ROOK, figures.figure.QUEEN)
+# Castling is stored as king capturing own rook, target of king by file
+CASTLING_TARGETS = {0: 2, 7: 6}
+
+
+class OpeningBook:
+    """
+    Polyglot opening book read through mmap.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = None
+        self._size = 0
+        # Empty file can't be mapped
+        if self._file.seek(0, 2):
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            self._size = len(self._map) // ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Close file of book.
+        """
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def get_size(self):
+        """
+        Return number of entries in book.
+        """
+        return self._size
+
+    def _get_key(self, index):
+        """
+        Return key of entry on index.
+        """
+        return struct.unpack_from('>Q', self._map, index * ENTRY.size)[0]
+
+    def get_entries(self, key):
+        """
+        Return list of (move, weight) for position with key, move is
+        in Polyglot form.
+        """
+        low = 0
+        high = self._size
+        # First entry with key
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        for index in range(low, self._size):
+            entry_key, move, weight, _ = ENTRY.unpack_from(
+                self._map, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+
+        return entries
+
+    def get_moves(self, board):
+        """
+        Return list of (move, weight) for position on board sorted by
+        weight, move is (start, target) or (start, target, promotion).
+        Moves with zero weight and illegal moves (from other position
+        with the same key) aren't returned.
+        """
+        entries = self.get_entries(board.get_hash())
+        if not entries:
+            return []
+        legal_moves = board.generate_moves(board.get_player())
+        moves = []
+        for value, weight in entries:
+            move = decode_move(board, value)
+            if weight and move in legal_moves and _is_legal(board, move):
+                moves.append((move, weight))
+
+        return sorted(moves, key=lambda move: -move[1])
+
+    def choose_move(self, board):
+        """
+        Return random book move for position on board chosen by weights or
+        None if position isn't in book.
+        """
+        moves = self.get_moves(board)
+        if not moves:
+            return None
+        return random.choices([move for move, _ in moves],
+                              [weight for _, weight in moves])[0]
+
+
+def _is_legal(board, move):
+    """
+    Check if pseudo-legal move doesn't leave king of player in check.
+    """
+    player = board.get_player()
+    board.make_move(move)
+    legal = not board.is_check(player)
+    board.unmake_move()
+    return legal
+
+
+def decode_move(board, value):
+    """
+    Decode Polyglot move to (start, target) or (start, target, promotion).
+    """
+    target = (value & 7, (value >> 3) & 7)
+    start = ((value >> 6) & 7, (value >> 9) & 7)
+    promotion = PROMOTIONS[(value >> 12) & 7]
+    if promotion:
+        return (start, target, promotion)
+
+    figure = board.get_figure(*start)
+    if (figure and figure.get_type() == figures.figure.KING and
+            start[0] == 4 and start[1] == target[1] and
+            target[0] in CASTLING_TARGETS):
+        target = (CASTLING_TARGETS[target[0]], target[1])
+    return (start, target)
+
+
+def prepare_parser():
+    """
+    Prepare parser for argument parsing.
+    """
+    parser = argparse.ArgumentParser(
+        description='Print moves of position in Polyglot opening book.')
+    parser.add_argument('book', help='Polyglot book file.')
+    parser.add_argument(
+        '-s',
+        metavar='FEN',
+        default='',
+        help='Position in FEN. Default is start position.')
+
+    return parser
+
+
+def main():
+    """
+    Main function.
+    """
+    args = prepare_parser().parse_args()
+    board = Board.from_fen(args.s) if args.s else Board('')
+    with OpeningBook(args.book) as book:
+        moves = book.get_moves(board)
+    for move, weight in moves:
+        move_text = '{}{}-{}{}'.format(chr(move[0][0] + 65), move[0][1] + 1,
+                                       chr(move[1][0] + 65), move[1][1] + 1)
+        if len(move) > 2:
+            move_text += ' ' + move[2]
+        print(move_text + ': ' + str(weight))
+    print('Moves: ' + str(len(moves)))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,38 @@ Python chess commandline client.
 import logging
 import re
 import argparse
+import json
 import sys
+import time
 import logic
+import perft
+from chess import trace
 
 LOG_LEVEL = logging.ERROR
 HUMAN_READABLE = False
+PERFT_DEPTH = 0
+PERFT_DIVIDE = False
+PERFT_SUITE = False
+PERFT_JOBS = 1
+BEST_MOVE = False
+SEARCH_DEPTH = None
+SEARCH_TIME = None
+SEARCH_THREADS = 1
+BOOK = None
+TABLEBASE = None
+BATCH = False
+BINARY_OUTPUT = False
+FEN_OUTPUT = False
+
+# Patterns compiled once for all processed moves
+STATE_PATTERN = re.compile(
+    r"^\[(((w|b)(ki|kn|r|b|q|p))?,){63}(w|b)(ki|kn|r|b|q|p)\]$")
+# Binary state (see Board.to_bytes) in hexadecimal form
+BINARY_STATE_PATTERN = re.compile("^[0-9a-fA-F]{68}$")
+FEN_PATTERN = re.compile(
+    r"^[1-8pnbrqkPNBRQK/]+ [wb] (-|[KQkq]+) (-|[a-h][36])( \d+ \d+)?$")
+STATE_SEPARATORS = re.compile(r"[\[\]\s'\"]")
+PLAYERS = ['WHITE', 'BLACK', 'W', 'B']
 
 # Convert figure marks to unicode character sequence
 SYMBOLS = {
@@ -35,7 +62,8 @@ def prepare_parser():
     parser.add_argument(
         '-s',
         metavar='state',
-        help='State of game. If no state is provided start state is generated.')
+        help='State of game. If no state is provided start state is generated. ' +
+        'State can be also in hexadecimal binary form (see --binary) or FEN.')
     parser.add_argument(
         '-m',
         metavar='move',
@@ -44,16 +72,21 @@ def prepare_parser():
     parser.add_argument(
         '-p',
         metavar='player',
-        choices=[
-            'WHITE',
-            'BLACK',
-            'W',
-            'B'],
+        choices=PLAYERS,
         help='Player on turn. Possible values WHITE|BLACK|W|B. Ignored if State is not provided.')
     parser.add_argument(
         '-H',
         action='store_true',
         help="Print output also in human readable format.")
+    parser.add_argument(
+        '--binary',
+        action='store_true',
+        help='Print state in hexadecimal binary form, which contains also ' +
+        'player on turn, castling and en passant.')
+    parser.add_argument(
+        '--fen',
+        action='store_true',
+        help='Print state in FEN.')
     parser.add_argument(
         '-ll',
         choices=[
@@ -65,6 +98,59 @@ def prepare_parser():
             'CRITICAL'],
         help='Change log level. Default is ERROR.')
     parser.add_argument('-lf', help='Log to file.')
+    parser.add_argument(
+        '--perft',
+        metavar='depth',
+        type=int,
+        help='Count leaf nodes reachable from state in specified depth and print ' +
+        'nodes per second. Move is ignored.')
+    parser.add_argument(
+        '--divide',
+        action='store_true',
+        help='Print perft node count for every move of player on turn.')
+    parser.add_argument(
+        '--suite',
+        action='store_true',
+        help='Compare perft results of reference positions up to perft depth.')
+    parser.add_argument(
+        '--jobs',
+        metavar='N',
+        type=int,
+        default=1,
+        help='Number of processes running perft. Default is 1.')
+    parser.add_argument(
+        '--best',
+        action='store_true',
+        help='Search the best move of player on turn. Move is ignored.')
+    parser.add_argument(
+        '--depth',
+        type=int,
+        help='Maximal depth of best move search in half-moves.')
+    parser.add_argument(
+        '--time',
+        metavar='ms',
+        type=int,
+        help='Time limit of best move search in milliseconds.')
+    parser.add_argument(
+        '--threads',
+        metavar='N',
+        type=int,
+        default=1,
+        help='Number of processes running best move search. Default is 1.')
+    parser.add_argument(
+        '--book',
+        metavar='path',
+        help='Polyglot opening book, best move is taken from book when ' +
+        'position is in it.')
+    parser.add_argument(
+        '--tablebase',
+        metavar='directory',
+        help='Directory of endgame tables used by best move search.')
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Read moves as JSON lines {"state", "player", "move"} from ' +
+        'standard input and print resulting states as JSON lines.')
 
     return parser
 
@@ -88,6 +174,8 @@ def set_log_level(log_level):
     if log_level == "CRITICAL":
         LOG_LEVEL = logging.CRITICAL
     logging.getLogger().setLevel(LOG_LEVEL)
+    # Trace of move generation is written only with INFO level
+    trace.enable(LOG_LEVEL <= logging.INFO)
     logging.info("Log level changed to %s", log_level)
 
 # Parse arguments
@@ -98,6 +186,19 @@ def parse_arguments():
     Method for parsing arguments.
     """
     global HUMAN_READABLE
+    global PERFT_DEPTH
+    global PERFT_DIVIDE
+    global PERFT_SUITE
+    global PERFT_JOBS
+    global BEST_MOVE
+    global SEARCH_DEPTH
+    global SEARCH_TIME
+    global SEARCH_THREADS
+    global BOOK
+    global TABLEBASE
+    global BATCH
+    global BINARY_OUTPUT
+    global FEN_OUTPUT
 
     state = ''
     move = ''
@@ -117,18 +218,58 @@ def parse_arguments():
         HUMAN_READABLE = True
         logging.info(
             "Parameter -H detected. Output will be printed in human readable form.")
+    # Perft
+    if args.perft is not None:
+        if args.perft < 1:
+            parser.error("perft depth must be at least 1")
+        if args.jobs < 1:
+            parser.error("number of jobs must be at least 1")
+        PERFT_DEPTH = args.perft
+        PERFT_DIVIDE = args.divide
+        PERFT_SUITE = args.suite
+        PERFT_JOBS = args.jobs
+    elif args.divide or args.suite:
+        parser.error("--divide and --suite require --perft")
+    # Best move search
+    if args.best:
+        if ((args.depth is not None and args.depth < 1) or
+                (args.time is not None and args.time < 1) or
+                args.threads < 1):
+            logging.error("Invalid search limit")
+            parser.print_help()
+            sys.exit(1)
+        BEST_MOVE = True
+        SEARCH_DEPTH = args.depth
+        SEARCH_TIME = args.time
+        SEARCH_THREADS = args.threads
+        BOOK = args.book
+        TABLEBASE = args.tablebase
+    # Binary output
+    if args.binary:
+        BINARY_OUTPUT = True
+    # FEN output
+    if args.fen:
+        FEN_OUTPUT = True
+    # Batch
+    if args.batch:
+        BATCH = True
+        return (state, move, player)
     # State
     if args.s:
-        state = args.s.replace('\'', '').replace(' ', '')
-        if (not re.match(
-                "^\[(((w|b)(ki|kn|r|b|q|p))?,){63}(w|b)(ki|kn|r|b|q|p)\]$", state)):
+        state = args.s.strip()
+        if not FEN_PATTERN.match(state):
+            state = state.replace('\'', '').replace(' ', '')
+        if not (STATE_PATTERN.match(state) or FEN_PATTERN.match(state) or
+                BINARY_STATE_PATTERN.match(state)):
             print (state)
             logging.error("Invalid state format %s", args.s)
             parser.print_help()
             sys.exit(1)
-        if args.m:
+        if PERFT_DEPTH or BEST_MOVE:
+            logging.info("Perft or search mode, move parameter is ignored.")
+        elif args.m:
             move = args.m
-            if not re.match("^[a-hA-H][1-8]-[a-hA-H][1-8]$", move):
+            if not logic.MOVE_PATTERN.match(move):
                 logging.error("Invalid move format %s", args.m)
                 parser.print_help()
                 sys.exit(1)
@@ -138,6 +279,10 @@ def parse_arguments():
             sys.exit(1)
         if args.p:
             player = args.p
+        elif BINARY_STATE_PATTERN.match(state) or FEN_PATTERN.match(state):
+            logging.info("Player is part of state.")
+        elif PERFT_DEPTH or BEST_MOVE:
+            player = 'W'
         else:
             logging.error("Player parameter not specified.")
             parser.print_help()
@@ -146,14 +291,17 @@ def parse_arguments():
     return (state, move, player)
 
 
-def get_coordinates(move):
+def convert_state(input_state):
     """
-    Get coordinates from move.
+    Convert state entered by player to list of figure marks, to bytes
+    for binary state or keep FEN.
     """
-    x_position = ord(move[0].lower()) - 97
-    y_position = int(move[1]) - 1
+    if BINARY_STATE_PATTERN.match(input_state):
+        return bytes.fromhex(input_state)
+    if FEN_PATTERN.match(input_state):
+        return input_state
 
-    return (x_position, y_position)
+    return STATE_SEPARATORS.sub("", input_state).split(',')
 
 
 def convert_position(input_text):
@@ -164,8 +312,8 @@ def convert_position(input_text):
     move_from = moves[0]
     move_to = moves[1]
 
-    coordinates_from = get_coordinates(move_from)
-    coordinates_to = get_coordinates(move_to)
+    coordinates_from = logic.get_coordinates(move_from)
+    coordinates_to = logic.get_coordinates(move_to)
 
     logging.debug(
         "Converted move from %s to %s:%s-%s:%s",
@@ -178,6 +326,153 @@ def convert_position(input_text):
     return (coordinates_from, coordinates_to)
 
 
+def get_position_text(position):
+    """
+    Convert coordinates in range 0-7 to position entered by player.
+    """
+    return chr(position[0] + 65) + str(position[1] + 1)
+
+
+def print_perft_output(game_logic):
+    """
+    Run perft on game and print the results.
+    """
+    nodes, elapsed, results = perft.run_perft(
+        game_logic, PERFT_DEPTH, PERFT_DIVIDE, PERFT_JOBS)
+    for move, move_nodes in results:
+        move_text = (get_position_text(move[0]) + '-' +
+                     get_position_text(move[1]))
+        # Promotion
+        if len(move) > 2:
+            move_text += ' ' + move[2]
+        print(move_text + ': ' + str(move_nodes))
+    if results:
+        print('Moves: ' + str(len(results)))
+    print('Nodes: ' + str(nodes))
+    print_speed(nodes, elapsed)
+
+
+def print_best_move_output(game_logic):
+    """
+    Search the best move of player on turn and print it.
+    """
+    start_time = time.perf_counter()
+    move = game_logic.best_move(SEARCH_DEPTH, SEARCH_TIME, SEARCH_THREADS)
+    elapsed = time.perf_counter() - start_time
+    if move is None:
+        print('Best move: none')
+    else:
+        move_text = (get_position_text(move[0]) + '-' +
+                     get_position_text(move[1]))
+        # Promotion
+        if len(move) > 2:
+            move_text += ' ' + move[2]
+        print('Best move: ' + move_text)
+    print('Time: {:.3f}s'.format(elapsed))
+
+
+def print_suite_output():
+    """
+    Run perft on reference positions and print the results.
+    Returns False if any result doesn't match the reference.
+    """
+    passed = True
+    for name, depth, expected, nodes, elapsed in perft.run_suite(PERFT_DEPTH, PERFT_JOBS):
+        if nodes == expected:
+            status = 'OK'
+        else:
+            status = 'FAILED'
+            passed = False
+        print(name + ' depth ' + str(depth) + ': ' + str(nodes) + '/' +
+              str(expected) + ' ' + status)
+        print_speed(nodes, elapsed)
+
+    return passed
+
+
+def print_speed(nodes, elapsed):
+    """
+    Print time and nodes per second.
+    """
+    print('Time: {:.3f}s'.format(elapsed))
+    if elapsed > 0:
+        print('Nodes/second: ' + str(int(nodes / elapsed)))
+
+
+def get_output_state(game_logic):
+    """
+    Return state of game in output form chosen by --binary or --fen.
+    """
+    if BINARY_OUTPUT:
+        return game_logic.get_state(binary=True).hex()
+    if FEN_OUTPUT:
+        return game_logic.get_fen()
+    return game_logic.get_state()
+
+
+def process_record(record):
+    """
+    Process one record of batch mode {"state", "player", "move"}.
+    Player is optional for binary state and FEN.
+    Returns dictionary with resulting state in output form, player on move
+    and information if move was done.
+    Raises ValueError if record is invalid.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Record must be JSON object")
+    state = record.get('state')
+    # generate starting state
+    if not state:
+        game_logic = logic.ChessLogic('')
+        return {'state': get_output_state(game_logic),
+                'player': game_logic.get_player().upper(), 'moved': False}
+
+    if isinstance(state, str):
+        state = convert_state(state)
+    if isinstance(state, (bytes, str)):
+        pass
+    elif (not isinstance(state, list) or len(state) != 64 or
+          any(not isinstance(mark, str) or (mark and mark not in SYMBOLS)
+              for mark in state)):
+        raise ValueError("Invalid state format")
+    move_input = record.get('move')
+    if not isinstance(move_input, str) or not logic.MOVE_PATTERN.match(move_input):
+        raise ValueError("Invalid move format {}".format(move_input))
+    player = record.get('player')
+    # Binary state and FEN contain player on move
+    if player is None and isinstance(state, (bytes, str)):
+        pass
+    elif not isinstance(player, str) or player.upper() not in PLAYERS:
+        raise ValueError("Invalid player {}".format(player))
+
+    game_logic = logic.ChessLogic(state)
+    if player is not None:
+        game_logic.set_player(player)
+    move = convert_position(move_input)
+    moved = game_logic.move_figure(move[0], move[1])
+
+    return {'state': get_output_state(game_logic),
+            'player': game_logic.get_player().upper(), 'moved': moved}
+
+
+def process_batch(input_stream, output_stream):
+    """
+    Process JSON lines from input stream and write results to output stream.
+    Invalid record is answered by {"error": message}.
+    """
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = process_record(json.loads(line))
+        except ValueError as error:
+            logging.error("Invalid batch record %s: %s", line, error)
+            result = {'error': str(error)}
+        output_stream.write(json.dumps(result) + '\n')
+        output_stream.flush()
+
+
 def print_nice_output(state):
     """
     Prints state in human readable form.
@@ -205,6 +500,41 @@ def main():
         level=LOG_LEVEL)
     input_state, move_input, player = parse_arguments()
 
+    # process moves from standard input
+    if BATCH:
+        process_batch(sys.stdin, sys.stdout)
+        return
+
+    # run perft on reference positions
+    if PERFT_SUITE:
+        if not print_suite_output():
+            sys.exit(1)
+        return
+
+    # run perft on state
+    if PERFT_DEPTH:
+        if input_state:
+            input_state = convert_state(input_state)
+        game_logic = logic.ChessLogic(input_state)
+        if player:
+            game_logic.set_player(player)
+        print_perft_output(game_logic)
+        return
+
+    # search the best move
+    if BEST_MOVE:
+        if input_state:
+            input_state = convert_state(input_state)
+        game_logic = logic.ChessLogic(input_state)
+        if player:
+            game_logic.set_player(player)
+        if BOOK:
+            game_logic.open_book(BOOK)
+        if TABLEBASE:
+            game_logic.open_tablebase(TABLEBASE)
+        print_best_move_output(game_logic)
+        return
+
     # generate starting state
     if not input_state:
         game_logic = logic.ChessLogic('')
@@ -212,18 +542,22 @@ def main():
     # process state
     else:
         # prepare current state
-        state = re.sub(r"[\[\]\s]", "", input_state).split(',')
+        state = convert_state(input_state)
 
         game_logic = logic.ChessLogic(state)
         move = convert_position(move_input)
-        game_logic.set_player(player)
+        if player:
+            game_logic.set_player(player)
         game_logic.move_figure(move[0], move[1])
         output_state = game_logic.get_state()
 
     if HUMAN_READABLE:
         print_nice_output(output_state)
         print('\nUse this state string for next move:')
-    print(output_state)
+    if BINARY_OUTPUT or FEN_OUTPUT:
+        print(get_output_state(game_logic))
+    else:
+        print(output_state)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+"""
+Helpers for 64-bit integer bitboards.
+Position x:y on the board is represented by bit with index y*8+x.
+"""
+
+EMPTY = 0
+FULL = (1 << 64) - 1
+
+
+def get_square(x_index, y_index):
+    """
+    Return square index of position.
+    """
+    return y_index * 8 + x_index
+
+
+def get_bit(x_index, y_index):
+    """
+    Return bitboard with only specified position set.
+    """
+    return 1 << (y_index * 8 + x_index)
+
+
+def get_position(square):
+    """
+    Return position (x, y) of square index.
+    """
+    return (square & 7, square >> 3)
+
+
+def contains(bitboard, x_index, y_index):
+    """
+    Check if position is set in bitboard.
+    Positions outside the board are never set.
+    """
+    return (0 <= x_index < 8 and 0 <= y_index < 8 and
+            bool(bitboard >> (y_index * 8 + x_index) & 1))
+
+
+def iterate(bitboard):
+    """
+    Generate square indexes of all bits set in bitboard.
+    """
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+def count(bitboard):
+    """
+    Return number of bits set in bitboard.
+    """
+    return bin(bitboard).count('1')
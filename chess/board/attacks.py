@@ -0,0 +1,140 @@
+"""
+Attack tables of figures. Tables are computed once on import and
+indexed by square of figure, every entry is bitboard of target squares.
+Sliding figures use separate table for every line (rank, file and both
+diagonals) indexed by occupancy of the line, so attacks of rook or bishop
+are found by two lookups.
+"""
+from ..figures import figure
+from .. import bitboard
+
+
+def _init_offset_table(offsets):
+    """
+    Generate table of target squares reachable by offsets from every square.
+    """
+    table = []
+    for square in range(64):
+        x_start, y_start = bitboard.get_position(square)
+        targets = bitboard.EMPTY
+        for x_offset, y_offset in offsets:
+            x_index = x_start + x_offset
+            y_index = y_start + y_offset
+            if 0 <= x_index < 8 and 0 <= y_index < 8:
+                targets |= bitboard.get_bit(x_index, y_index)
+        table.append(targets)
+
+    return table
+
+
+def _init_pawn_double_pushes(direction, start_y):
+    """
+    Generate table of pawn moves two squares forward from starting position.
+    """
+    table = [bitboard.EMPTY] * 64
+    for x_index in range(8):
+        square = bitboard.get_square(x_index, start_y)
+        table[square] = bitboard.get_bit(x_index, start_y + 2 * direction)
+
+    return table
+
+
+KNIGHT_ATTACKS = _init_offset_table(
+    [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _init_offset_table(
+    [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+PAWN_ATTACKS = {
+    figure.WHITE: _init_offset_table([(-1, 1), (1, 1)]),
+    figure.BLACK: _init_offset_table([(-1, -1), (1, -1)])}
+PAWN_PUSHES = {
+    figure.WHITE: _init_offset_table([(0, 1)]),
+    figure.BLACK: _init_offset_table([(0, -1)])}
+PAWN_DOUBLE_PUSHES = {
+    figure.WHITE: _init_pawn_double_pushes(1, 1),
+    figure.BLACK: _init_pawn_double_pushes(-1, 6)}
+
+
+def _init_line_tables(directions):
+    """
+    Generate tables of sliding attacks along one line.
+    Returns (masks, attacks). Mask of square contains squares on line which
+    can block the movement (edges of board are excluded). Attacks of square
+    is dictionary indexed by occupancy of mask with bitboard of targets.
+    """
+    masks = []
+    attacks = []
+    for square in range(64):
+        x_start, y_start = bitboard.get_position(square)
+        mask = bitboard.EMPTY
+        for x_step, y_step in directions:
+            x_index = x_start + x_step
+            y_index = y_start + y_step
+            while 0 <= x_index + x_step < 8 and 0 <= y_index + y_step < 8:
+                mask |= bitboard.get_bit(x_index, y_index)
+                x_index += x_step
+                y_index += y_step
+
+        # Enumerate all subsets of mask
+        table = {}
+        occupied = bitboard.EMPTY
+        while True:
+            table[occupied] = _get_ray_targets(square, occupied, directions)
+            occupied = (occupied - mask) & mask
+            if not occupied:
+                break
+
+        masks.append(mask)
+        attacks.append(table)
+
+    return (masks, attacks)
+
+
+def _get_ray_targets(square, occupied, directions):
+    """
+    Walk rays from square until the first occupied position.
+    """
+    x_start, y_start = bitboard.get_position(square)
+    targets = bitboard.EMPTY
+    for x_step, y_step in directions:
+        x_index = x_start + x_step
+        y_index = y_start + y_step
+        while 0 <= x_index < 8 and 0 <= y_index < 8:
+            target = bitboard.get_bit(x_index, y_index)
+            targets |= target
+            if occupied & target:
+                break
+            x_index += x_step
+            y_index += y_step
+
+    return targets
+
+
+RANK_MASKS, RANK_ATTACKS = _init_line_tables([(1, 0), (-1, 0)])
+FILE_MASKS, FILE_ATTACKS = _init_line_tables([(0, 1), (0, -1)])
+DIAGONAL_MASKS, DIAGONAL_ATTACKS = _init_line_tables([(1, 1), (-1, -1)])
+ANTI_DIAGONAL_MASKS, ANTI_DIAGONAL_ATTACKS = _init_line_tables(
+    [(1, -1), (-1, 1)])
+
+
+def get_rook_attacks(square, occupied):
+    """
+    Return bitboard of positions attacked by rook on square.
+    """
+    return (RANK_ATTACKS[square][occupied & RANK_MASKS[square]] |
+            FILE_ATTACKS[square][occupied & FILE_MASKS[square]])
+
+
+def get_bishop_attacks(square, occupied):
+    """
+    Return bitboard of positions attacked by bishop on square.
+    """
+    return (DIAGONAL_ATTACKS[square][occupied & DIAGONAL_MASKS[square]] |
+            ANTI_DIAGONAL_ATTACKS[square][
+                occupied & ANTI_DIAGONAL_MASKS[square]])
+
+
+def get_queen_attacks(square, occupied):
+    """
+    Return bitboard of positions attacked by queen on square.
+    """
+    return get_rook_attacks(square, occupied) | get_bishop_attacks(square, occupied)
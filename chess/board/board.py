@@ -1,11 +1,137 @@
 """
 Board module for chess game. It contains information about every field on game board.
 Every figure is asking this module for information about other figures.
+Figures are stored in bitboards (one 64-bit integer per figure type and color),
+figure objects are kept only to be returned by get_figure.
+Board also keeps map of attacked positions, which is updated on every move
+only for figures affected by the move.
+Moves can be played by make_move and taken back by unmake_move.
+Zobrist hash of position is updated with every change of the board.
+Position can be stored in compact binary form by to_bytes and loaded back
+by Board.from_bytes, or in FEN by to_fen and Board.from_fen.
 """
 import logging
-import itertools
 from .. import figures
-from .field import Field
+from .. import bitboard
+from .. import trace
+from . import attacks
+from . import zobrist
+
+FIGURE_TYPES = [
+    figures.figure.PAWN,
+    figures.figure.KNIGHT,
+    figures.figure.BISHOP,
+    figures.figure.ROOK,
+    figures.figure.QUEEN,
+    figures.figure.KING]
+
+# Castling rights
+WHITE_KING_SIDE = 1
+WHITE_QUEEN_SIDE = 2
+BLACK_KING_SIDE = 4
+BLACK_QUEEN_SIDE = 8
+ALL_CASTLING = 15
+
+
+def _init_castling_masks():
+    """
+    Generate castling rights which stay after move from or to square.
+    """
+    masks = [ALL_CASTLING] * 64
+    masks[bitboard.get_square(4, 0)] &= ~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE)
+    masks[bitboard.get_square(7, 0)] &= ~WHITE_KING_SIDE
+    masks[bitboard.get_square(0, 0)] &= ~WHITE_QUEEN_SIDE
+    masks[bitboard.get_square(4, 7)] &= ~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE)
+    masks[bitboard.get_square(7, 7)] &= ~BLACK_KING_SIDE
+    masks[bitboard.get_square(0, 7)] &= ~BLACK_QUEEN_SIDE
+    return masks
+
+
+CASTLING_MASKS = _init_castling_masks()
+
+# Binary form of position: 4 bits per square (type index + 1, black figures
+# have 8 added), flags (black on move and castling rights) and en passant
+# square + 1 (0 without en passant)
+BINARY_SIZE = 34
+BLACK_CODE = 8
+# Figure marks of state indexed by color and type
+FIGURE_MARKS = {
+    figures.figure.WHITE: {
+        figures.figure.PAWN: 'wp',
+        figures.figure.KNIGHT: 'wkn',
+        figures.figure.BISHOP: 'wb',
+        figures.figure.ROOK: 'wr',
+        figures.figure.QUEEN: 'wq',
+        figures.figure.KING: 'wki'},
+    figures.figure.BLACK: {
+        figures.figure.PAWN: 'bp',
+        figures.figure.KNIGHT: 'bkn',
+        figures.figure.BISHOP: 'bb',
+        figures.figure.ROOK: 'br',
+        figures.figure.QUEEN: 'bq',
+        figures.figure.KING: 'bki'}}
+# Color and type of figure indexed by mark of state
+MARK_FIGURES = {
+    mark: (color, figure_type)
+    for color, marks in FIGURE_MARKS.items()
+    for figure_type, mark in marks.items()}
+EMPTY_STATE = [''] * 64
+
+# Color and type of figure indexed by FEN letter
+FEN_FIGURES = {
+    'P': (figures.figure.WHITE, figures.figure.PAWN),
+    'N': (figures.figure.WHITE, figures.figure.KNIGHT),
+    'B': (figures.figure.WHITE, figures.figure.BISHOP),
+    'R': (figures.figure.WHITE, figures.figure.ROOK),
+    'Q': (figures.figure.WHITE, figures.figure.QUEEN),
+    'K': (figures.figure.WHITE, figures.figure.KING),
+    'p': (figures.figure.BLACK, figures.figure.PAWN),
+    'n': (figures.figure.BLACK, figures.figure.KNIGHT),
+    'b': (figures.figure.BLACK, figures.figure.BISHOP),
+    'r': (figures.figure.BLACK, figures.figure.ROOK),
+    'q': (figures.figure.BLACK, figures.figure.QUEEN),
+    'k': (figures.figure.BLACK, figures.figure.KING)}
+# FEN letter indexed by color and type of figure
+FEN_LETTERS = {figure: letter for letter, figure in FEN_FIGURES.items()}
+FEN_CASTLING = [('K', WHITE_KING_SIDE), ('Q', WHITE_QUEEN_SIDE),
+                ('k', BLACK_KING_SIDE), ('q', BLACK_QUEEN_SIDE)]
+FEN_PLAYERS = {'w': figures.figure.WHITE, 'b': figures.figure.BLACK}
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+def _parse_placement(placement):
+    """
+    Parse figure placement part of FEN.
+    Returns list of (square, color, type).
+    Raises ValueError if placement isn't valid.
+    """
+    result = []
+    x_index = 0
+    y_index = 7
+    for char in placement:
+        if char == '/':
+            if x_index != 8 or y_index == 0:
+                raise ValueError("Invalid FEN placement {}".format(placement))
+            x_index = 0
+            y_index -= 1
+        elif char in '12345678':
+            x_index += ord(char) - 48
+        elif char in FEN_FIGURES and x_index < 8:
+            color, figure_type = FEN_FIGURES[char]
+            result.append((y_index * 8 + x_index, color, figure_type))
+            x_index += 1
+        else:
+            raise ValueError("Invalid FEN placement {}".format(placement))
+        if x_index > 8:
+            raise ValueError("Invalid FEN placement {}".format(placement))
+    if x_index != 8 or y_index != 0:
+        raise ValueError("Invalid FEN placement {}".format(placement))
+
+    return result
+
+
+# Figures of new game as list of (square, color, type)
+START_PLACEMENT = _parse_placement(START_FEN.split()[0])
 
 
 class Board:
@@ -14,8 +140,48 @@ class Board:
     """
 
     def __init__(self, state):
-        self._fields = self._init_fields(state)
         self._size = [8, 8]
+        # Figure objects indexed by square
+        self._figures = [None] * 64
+        # Bitboards of figures by color and type
+        self._bitboards = {
+            figures.figure.WHITE: dict.fromkeys(FIGURE_TYPES, bitboard.EMPTY),
+            figures.figure.BLACK: dict.fromkeys(FIGURE_TYPES, bitboard.EMPTY)}
+        # Bitboards of all figures by color
+        self._occupied = {
+            figures.figure.WHITE: bitboard.EMPTY,
+            figures.figure.BLACK: bitboard.EMPTY}
+        # Figure objects by color
+        self._pieces = {
+            figures.figure.WHITE: [],
+            figures.figure.BLACK: []}
+        # King figure by color
+        self._kings = {
+            figures.figure.WHITE: None,
+            figures.figure.BLACK: None}
+        # Castling rights
+        self._castling = 0
+        # Square oponent pawn skipped in last move
+        self._en_passant = None
+        # Half-moves since last capture or pawn move and number of full move
+        self._halfmove_clock = 0
+        self._fullmove_number = 1
+        # Player on move
+        self._player = figures.figure.WHITE
+        # Zobrist hash of position
+        self._hash = 0
+        # Information needed to take back played moves
+        self._history = []
+        # Bitboards of positions attacked by figure indexed by square of figure
+        self._figure_attacks = [bitboard.EMPTY] * 64
+        # Number of figures attacking every position by color
+        self._attack_counts = {
+            figures.figure.WHITE: [0] * 64,
+            figures.figure.BLACK: [0] * 64}
+        self._init_fields(state)
+        self._init_attacks()
+        self._init_castling()
+        self._hash ^= zobrist.CASTLING_KEYS[self._castling] ^ zobrist.WHITE_KEY
 
     def _init_fields(self, state):
         """
@@ -25,82 +191,32 @@ class Board:
 
         # generate new game state
         if not state:
-            logging.debug("Generating new game.")
-            return self._init_new_game()
+            if trace.ENABLED:
+                trace.log("Generating new game.")
+            self._init_new_game()
         else:
             # generate game from existing state
-            fields = []
-            row = []
-            field_color = figures.figure.BLACK
-            for y_index in range(0, 8):
-                for x_index in range(0, 8):
-                    figure_color = ''
-                    # to get coordination from 1D array we need to convert 2D to 1D
-                    # index in state is get as y_index*8+x_index
-                    index = y_index * 8 + x_index
-                    field_state = state[index]
-                    # If field is empty continue
-                    if not field_state:
-                        row.append(Field(field_color))
-                    else:
-                        logging.debug(
-                            "Figure %s found on index %s", state[index], index)
-                        # Black
-                        if state[index].startswith('b'):
-                            figure_color = figures.figure.BLACK
-                        # White
-                        elif state[index].startswith('w'):
-                            figure_color = figures.figure.WHITE
-                        else:
-                            logging.error(
-                                "Undefined figure color %s", state[index])
-                        # King found
-                        if state[index].endswith('ki'):
-                            figure_type = figures.figure.KING
-                        # Knight found
-                        elif state[index].endswith('kn'):
-                            figure_type = figures.figure.KNIGHT
-                        # Rook found
-                        elif state[index].endswith('r'):
-                            figure_type = figures.figure.ROOK
-                        # Bishop found
-                        elif state[index].endswith('b'):
-                            figure_type = figures.figure.BISHOP
-                        # Queen found
-                        elif state[index].endswith('q'):
-                            figure_type = figures.figure.QUEEN
-                        # Pawn found
-                        elif state[index].endswith('p'):
-                            figure_type = figures.figure.PAWN
-
-                        logging.info(
-                            "Generating %s with color %s on %s:%s",
-                            figure_type,
-                            figure_color,
-                            x_index,
-                            y_index)
-
-                        # generate figure
-                        figure = self._generate_figure(
-                            figure_type, figure_color, x_index, y_index)
-                        row.append(Field(field_color, figure))
-
-                    field_color = self._switch_color(field_color)
-
-                # save current row
-                fields.append(row)
-                row = []
-
-        return fields
-
-    def _switch_color(self, color):
-        """
-        Switch current color to opposite color.
-        """
-        if color == figures.figure.BLACK:
-            return figures.figure.WHITE
-        else:
-            return figures.figure.BLACK
+            # index in state is get as y_index*8+x_index
+            placement = []
+            for index, mark in enumerate(state):
+                # Skip empty field
+                if not mark:
+                    continue
+                figure = MARK_FIGURES.get(mark)
+                if figure is None:
+                    logging.error("Undefined figure %s", mark)
+                    continue
+                placement.append((index, figure[0], figure[1]))
+            self._init_figures(placement)
+
+    def _init_figures(self, placement):
+        """
+        Generate figures from list of (square, color, type).
+        """
+        for square, figure_color, figure_type in placement:
+            x_index, y_index = bitboard.get_position(square)
+            self._set_figure(square, self._generate_figure(
+                figure_type, figure_color, x_index, y_index))
 
     def _generate_figure(self, figure_type, color, x_index, y_index):
         """
@@ -154,94 +270,429 @@ class Board:
 
     def _init_new_game(self):
         """
-        Generate figures array for new game.
-        """
-        fields = []
-        row = []
-        field_color = figures.figure.BLACK
-        for y_index in range(0, 8):
-            for x_index in range(0, 8):
-                figure_type = None
-                # resolve figure color
-                if y_index in [0, 1]:
-                    figure_color = figures.figure.WHITE
-                else:
-                    figure_color = figures.figure.BLACK
-
-                # resolve type of figure
-                if y_index in [1, 6]:
-                    figure_type = figures.figure.PAWN
-                if y_index in [0, 7] and x_index in [0, 7]:
-                    figure_type = figures.figure.ROOK
-                if y_index in [0, 7] and x_index in [1, 6]:
-                    figure_type = figures.figure.KNIGHT
-                if y_index in [0, 7] and x_index in [2, 5]:
-                    figure_type = figures.figure.BISHOP
-                if y_index in [0, 7] and x_index in [3]:
-                    figure_type = figures.figure.QUEEN
-                if y_index in [0, 7] and x_index in [4]:
-                    figure_type = figures.figure.KING
-
-                logging.info(
-                    "Generating %s with color %s on %s:%s",
-                    figure_type,
-                    figure_color,
-                    x_index,
-                    y_index)
-
-                # generate figure
-                if figure_type:
-                    figure = self._generate_figure(
-                        figure_type, figure_color, x_index, y_index)
-                    row.append(Field(field_color, figure))
-                else:
-                    row.append(Field(field_color))
+        Generate figures for new game from precomputed template.
+        """
+        self._init_figures(START_PLACEMENT)
 
-                field_color = self._switch_color(field_color)
+    def _set_figure(self, square, figure):
+        """
+        Place figure on square.
+        """
+        square_bit = 1 << square
+        owner = figure.get_owner()
+        self._figures[square] = figure
+        self._bitboards[owner][figure.get_type()] |= square_bit
+        self._occupied[owner] |= square_bit
+        self._pieces[owner].append(figure)
+        if figure.get_type() == figures.figure.KING:
+            self._kings[owner] = figure
+        self._hash ^= zobrist.FIGURE_KEYS[owner][figure.get_type()][square]
+
+    def _clear_square(self, square):
+        """
+        Remove figure from square.
+        Returns removed figure or None if square was empty.
+        """
+        figure = self._figures[square]
+        if figure:
+            square_bit = 1 << square
+            owner = figure.get_owner()
+            self._figures[square] = None
+            self._bitboards[owner][figure.get_type()] &= ~square_bit
+            self._occupied[owner] &= ~square_bit
+            self._pieces[owner].remove(figure)
+            if self._kings[owner] is figure:
+                self._kings[owner] = None
+            self._hash ^= zobrist.FIGURE_KEYS[owner][figure.get_type()][square]
 
-            # save current row
-            fields.append(row)
-            row = []
+        return figure
+
+    def _init_castling(self):
+        """
+        Initialize castling rights.
+        State doesn't contain castling rights, so castling is possible
+        when king and rook are in starting positions.
+        """
+        for color, y_index, king_side, queen_side in [
+                (figures.figure.WHITE, 0, WHITE_KING_SIDE, WHITE_QUEEN_SIDE),
+                (figures.figure.BLACK, 7, BLACK_KING_SIDE, BLACK_QUEEN_SIDE)]:
+            if not self._is_figure(4, y_index, color, figures.figure.KING):
+                continue
+            if self._is_figure(7, y_index, color, figures.figure.ROOK):
+                self._castling |= king_side
+            if self._is_figure(0, y_index, color, figures.figure.ROOK):
+                self._castling |= queen_side
+
+    def _is_figure(self, x_index, y_index, figure_color, figure_type):
+        """
+        Check if figure of specified color and type is on position.
+        """
+        return bitboard.contains(
+            self._bitboards[figure_color][figure_type], x_index, y_index)
 
-        return fields
+    def _init_attacks(self):
+        """
+        Compute attacks of all figures on board.
+        """
+        for square in bitboard.iterate(self.get_occupied()):
+            self._update_figure_attacks(square)
+
+    def _get_figure_attacks(self, square, figure):
+        """
+        Return bitboard of positions attacked by figure on square.
+        """
+        figure_type = figure.get_type()
+        if figure_type == figures.figure.PAWN:
+            return attacks.PAWN_ATTACKS[figure.get_owner()][square]
+        if figure_type == figures.figure.KNIGHT:
+            return attacks.KNIGHT_ATTACKS[square]
+        if figure_type == figures.figure.KING:
+            return attacks.KING_ATTACKS[square]
+        if figure_type == figures.figure.BISHOP:
+            return attacks.get_bishop_attacks(square, self.get_occupied())
+        if figure_type == figures.figure.ROOK:
+            return attacks.get_rook_attacks(square, self.get_occupied())
+        return attacks.get_queen_attacks(square, self.get_occupied())
+
+    def _update_figure_attacks(self, square, figure=None):
+        """
+        Update attack map with attacks of figure on square.
+        If figure is provided, its attacks are removed from the map
+        (figure left the square).
+        """
+        old_attacks = self._figure_attacks[square]
+        if figure:
+            new_attacks = bitboard.EMPTY
+        else:
+            figure = self._figures[square]
+            new_attacks = self._get_figure_attacks(square, figure)
+
+        if old_attacks != new_attacks:
+            counts = self._attack_counts[figure.get_owner()]
+            for target in bitboard.iterate(old_attacks & ~new_attacks):
+                counts[target] -= 1
+            for target in bitboard.iterate(new_attacks & ~old_attacks):
+                counts[target] += 1
+            self._figure_attacks[square] = new_attacks
+
+    def _update_slider_attacks(self, changed, skip=bitboard.EMPTY):
+        """
+        Update attacks of sliding figures which are attacking changed positions.
+        Other figures attacks don't depend on occupancy of the board.
+        """
+        sliders = bitboard.EMPTY
+        for figure_color in self._bitboards:
+            bitboards = self._bitboards[figure_color]
+            sliders |= (bitboards[figures.figure.BISHOP] |
+                        bitboards[figures.figure.ROOK] |
+                        bitboards[figures.figure.QUEEN])
+        for square in bitboard.iterate(sliders & ~skip):
+            if self._figure_attacks[square] & changed:
+                self._update_figure_attacks(square)
 
     def get_figure(self, x_index, y_index):
         """
         Return figure object on specified position.
         Returns None if no object is on specified positon.
         """
-        return self._fields[y_index][x_index].get_figure()
+        return self._figures[y_index * 8 + x_index]
+
+    def get_bitboard(self, figure_color, figure_type):
+        """
+        Return bitboard of figures with specified color and type.
+        """
+        return self._bitboards[figure_color][figure_type]
+
+    def get_occupied(self, figure_color=None):
+        """
+        Return bitboard of figures with specified color.
+        If no color is specified, return bitboard of all figures.
+        """
+        if figure_color:
+            return self._occupied[figure_color]
+
+        return (self._occupied[figures.figure.WHITE] |
+                self._occupied[figures.figure.BLACK])
+
+    def is_occupied_by(self, x_index, y_index, figure_color):
+        """
+        Check if there is figure of specified color on position.
+        """
+        return bool(self._occupied[figure_color] >> (y_index * 8 + x_index) & 1)
 
     def get_king(self, figure_color):
         """
         Return king of specified color.
         This method can be used for checking a wining conditions.
         """
+        return self._kings[figure_color]
+
+    def get_figures(self, figure_color):
+        """
+        Return list of figures with specified color.
+        The list is owned by board and changes with every move.
+        """
+        return self._pieces[figure_color]
+
+    def generate_moves(self, figure_color):
+        """
+        Return pseudo-legal moves of player as list of (start, target)
+        or (start, target, promotion) for pawn promotion.
+        """
+        moves = []
+        for fig in self._pieces[figure_color]:
+            start = fig.get_position()
+            fig_type = fig.get_type()
+            for move in fig.generate_moves():
+                if move[2] == fig_type:
+                    moves.append((start, (move[0], move[1])))
+                else:
+                    moves.append((start, (move[0], move[1]), move[2]))
 
-        for (position_x, position_y) in itertools.product(range(8), repeat=2):
-            fig = self.get_figure(position_x, position_y)
-            if (fig and fig.get_type() == figures.figure.KING and
-                    fig.get_owner == figure_color):
-                return fig
+        return moves
 
-        return None
+    def is_check(self, figure_color):
+        """
+        Check if king of specified color is in check.
+        """
+        king = self._kings[figure_color]
+        return bool(king and king.is_check())
 
     def remove_figure(self, x_index, y_index):
         """
         Remove figure object on specified position.
         """
-        self._fields[y_index][x_index].remove_figure()
+        square = bitboard.get_square(x_index, y_index)
+        figure = self._clear_square(square)
+        if figure:
+            self._update_figure_attacks(square, figure)
+            self._update_slider_attacks(1 << square)
 
     def move_figure(self, move_from, move_to):
         """
         Move figure from one field to other.
         """
-        from_field = self._fields[move_from[1]][move_from[0]]
-        to_field = self._fields[move_to[1]][move_to[0]]
+        from_square = bitboard.get_square(*move_from)
+        to_square = bitboard.get_square(*move_to)
+        figure = self._clear_square(from_square)
+        self._update_figure_attacks(from_square, figure)
+        captured = self._clear_square(to_square)
+        if captured:
+            self._update_figure_attacks(to_square, captured)
+        self._set_figure(to_square, figure)
+        self._update_figure_attacks(to_square)
+        self._update_slider_attacks(
+            (1 << from_square) | (1 << to_square), 1 << to_square)
+
+    def _place_figure(self, square, figure):
+        """
+        Place figure on empty square and update attacks.
+        """
+        self._set_figure(square, figure)
+        self._update_figure_attacks(square)
+        self._update_slider_attacks(1 << square, 1 << square)
+
+    def make_move(self, move):
+        """
+        Play move (from, to) or (from, to, figure type) without any test.
+        Figure type is used for promotion of pawn (queen by default).
+        Castling, en passant and promotion are done by this method.
+        Move can be taken back by unmake_move.
+        """
+        move_from, move_to = move[0], move[1]
+        from_square = bitboard.get_square(*move_from)
+        to_square = bitboard.get_square(*move_to)
+        figure = self._figures[from_square]
+        figure_type = figure.get_type()
+        captured = self._figures[to_square]
+        captured_square = to_square
+        rook_move = None
+        promoted = None
+        previous_hash = self._hash
+        en_passant_key = self._get_en_passant_key()
+
+        # En passant
+        if (figure_type == figures.figure.PAWN and not captured and
+                to_square == self._en_passant):
+            captured_square = bitboard.get_square(move_to[0], move_from[1])
+            captured = self._figures[captured_square]
+            self.remove_figure(move_to[0], move_from[1])
+
+        flags = figure.get_flags()
+        self.move_figure(move_from, move_to)
+        figure.set_position(*move_to)
+
+        # Castling
+        if (figure_type == figures.figure.KING and
+                abs(move_to[0] - move_from[0]) == 2):
+            if move_to[0] > move_from[0]:
+                rook_move = ((7, move_to[1]), (move_to[0] - 1, move_to[1]))
+            else:
+                rook_move = ((0, move_to[1]), (move_to[0] + 1, move_to[1]))
+            self.move_figure(rook_move[0], rook_move[1])
+            self.get_figure(*rook_move[1]).set_position(*rook_move[1])
+
+        en_passant = None
+        if figure_type == figures.figure.PAWN:
+            # Promotion
+            if move_to[1] in [0, self._size[1] - 1]:
+                promotion = move[2] if len(move) > 2 else figures.figure.QUEEN
+                self.remove_figure(*move_to)
+                promoted = self._generate_figure(
+                    promotion, figure.get_owner(), move_to[0], move_to[1])
+                self._place_figure(to_square, promoted)
+            # Two squares forward
+            elif abs(move_to[1] - move_from[1]) == 2:
+                en_passant = (from_square + to_square) // 2
+
+        self._history.append((move_from, move_to, figure, flags,
+                              captured, captured_square, rook_move, promoted,
+                              self._castling, self._en_passant, previous_hash,
+                              self._halfmove_clock))
+        if captured or figure_type == figures.figure.PAWN:
+            self._halfmove_clock = 0
+        else:
+            self._halfmove_clock += 1
+        if self._player == figures.figure.BLACK:
+            self._fullmove_number += 1
+        self._hash ^= zobrist.CASTLING_KEYS[self._castling] ^ en_passant_key
+        self._castling &= CASTLING_MASKS[from_square] & CASTLING_MASKS[to_square]
+        self._en_passant = en_passant
+        self._player = figures.figure.get_oponent(self._player)
+        self._hash ^= (zobrist.CASTLING_KEYS[self._castling] ^
+                       self._get_en_passant_key() ^ zobrist.WHITE_KEY)
+
+    def unmake_move(self):
+        """
+        Take back last move played by make_move.
+        """
+        (move_from, move_to, figure, flags, captured, captured_square,
+         rook_move, promoted, self._castling, self._en_passant,
+         previous_hash, self._halfmove_clock) = self._history.pop()
+        self._player = figures.figure.get_oponent(self._player)
+        if self._player == figures.figure.BLACK:
+            self._fullmove_number -= 1
+
+        if promoted:
+            self.remove_figure(*move_to)
+            self._place_figure(bitboard.get_square(*move_from), figure)
+        else:
+            self.move_figure(move_to, move_from)
+        figure.set_position(*move_from)
+        figure.set_flags(flags)
+
+        if rook_move:
+            self.move_figure(rook_move[1], rook_move[0])
+            self.get_figure(*rook_move[0]).set_position(*rook_move[0])
+
+        if captured:
+            self._place_figure(captured_square, captured)
+
+        self._hash = previous_hash
 
-        figure = from_field.get_figure()
-        to_field.set_figure(figure)
-        from_field.remove_figure()
+    def _get_en_passant_key(self):
+        """
+        Return zobrist key of en passant position.
+        As in Polyglot, en passant is hashed only if pawn of player on move
+        can capture.
+        """
+        if self._en_passant is None:
+            return 0
+        oponent = figures.figure.get_oponent(self._player)
+        if (attacks.PAWN_ATTACKS[oponent][self._en_passant] &
+                self._bitboards[self._player][figures.figure.PAWN]):
+            return zobrist.EN_PASSANT_KEYS[self._en_passant & 7]
+        return 0
+
+    def get_hash(self):
+        """
+        Return zobrist hash of position.
+        Hash contains figures, player on move, castling rights and en passant.
+        """
+        return self._hash
+
+    def get_player(self):
+        """
+        Return player on move.
+        """
+        return self._player
+
+    def set_player(self, player):
+        """
+        Change player on move.
+        """
+        if player != self._player:
+            self._hash ^= self._get_en_passant_key()
+            self._player = player
+            self._hash ^= self._get_en_passant_key() ^ zobrist.WHITE_KEY
+
+    def has_castling_right(self, figure_color, king_side):
+        """
+        Check if king and rook of specified side didn't move yet.
+        """
+        if figure_color == figures.figure.WHITE:
+            right = WHITE_KING_SIDE if king_side else WHITE_QUEEN_SIDE
+        else:
+            right = BLACK_KING_SIDE if king_side else BLACK_QUEEN_SIDE
+        return bool(self._castling & right)
+
+    def get_castling(self):
+        """
+        Return castling rights as bitmask of castling constants.
+        """
+        return self._castling
+
+    def set_castling(self, castling):
+        """
+        Set castling rights as bitmask of castling constants.
+        """
+        self._hash ^= (zobrist.CASTLING_KEYS[self._castling] ^
+                       zobrist.CASTLING_KEYS[castling])
+        self._castling = castling
+
+    def get_en_passant(self):
+        """
+        Return position oponent pawn skipped in last move or None.
+        """
+        if self._en_passant is None:
+            return None
+        return bitboard.get_position(self._en_passant)
+
+    def set_en_passant(self, position):
+        """
+        Set position oponent pawn skipped in last move (None if there is
+        no such position).
+        """
+        self._hash ^= self._get_en_passant_key()
+        if position is None:
+            self._en_passant = None
+        else:
+            self._en_passant = bitboard.get_square(position[0], position[1])
+        self._hash ^= self._get_en_passant_key()
+
+    def get_attackers(self, x_index, y_index, figure_color, occupied=None):
+        """
+        Return bitboard of figures with specified color attacking position.
+        Sliding figures are tested with occupied bitboard if provided
+        (this is needed to test position behind figure which is moving).
+        """
+        if occupied is None:
+            occupied = self.get_occupied()
+        square = bitboard.get_square(x_index, y_index)
+        bitboards = self._bitboards[figure_color]
+        oponent = figures.figure.get_oponent(figure_color)
+        return ((attacks.PAWN_ATTACKS[oponent][square] &
+                 bitboards[figures.figure.PAWN]) |
+                (attacks.KNIGHT_ATTACKS[square] &
+                 bitboards[figures.figure.KNIGHT]) |
+                (attacks.KING_ATTACKS[square] &
+                 bitboards[figures.figure.KING]) |
+                (attacks.get_bishop_attacks(square, occupied) &
+                 (bitboards[figures.figure.BISHOP] |
+                  bitboards[figures.figure.QUEEN])) |
+                (attacks.get_rook_attacks(square, occupied) &
+                 (bitboards[figures.figure.ROOK] |
+                  bitboards[figures.figure.QUEEN])))
 
     def get_size(self):
         """
@@ -249,28 +700,157 @@ class Board:
         """
         return self._size
 
-    def _test_position(self, x_index, y_index):
+    def to_bytes(self):
+        """
+        Return position in binary form of BINARY_SIZE bytes.
+        """
+        codes = [0] * 64
+        for color, color_code in [(figures.figure.WHITE, 0),
+                                  (figures.figure.BLACK, BLACK_CODE)]:
+            for figure in self._pieces[color]:
+                x_index, y_index = figure.get_position()
+                codes[y_index * 8 + x_index] = (
+                    FIGURE_TYPES.index(figure.get_type()) + 1 + color_code)
+
+        data = bytearray(BINARY_SIZE)
+        for index in range(32):
+            data[index] = codes[2 * index] | codes[2 * index + 1] << 4
+        data[32] = self._castling << 1
+        if self._player == figures.figure.BLACK:
+            data[32] |= 1
+        if self._en_passant is not None:
+            data[33] = self._en_passant + 1
+
+        return bytes(data)
+
+    @staticmethod
+    def from_bytes(data):
+        """
+        Create board from binary form returned by to_bytes.
+        Raises ValueError if data isn't valid.
+        """
+        if len(data) != BINARY_SIZE or data[33] > 64:
+            raise ValueError("Invalid binary position")
+        placement = []
+        for index in range(64):
+            code = (data[index >> 1] >> (4 * (index & 1))) & 15
+            if code:
+                color = figures.figure.WHITE
+                if code & BLACK_CODE:
+                    color = figures.figure.BLACK
+                type_index = (code & 7) - 1
+                if type_index >= len(FIGURE_TYPES):
+                    raise ValueError("Invalid figure code {}".format(code))
+                placement.append((index, color, FIGURE_TYPES[type_index]))
+
+        player = figures.figure.WHITE
+        if data[32] & 1:
+            player = figures.figure.BLACK
+        en_passant = None
+        if data[33]:
+            en_passant = bitboard.get_position(data[33] - 1)
+
+        return Board._from_placement(
+            placement, player, (data[32] >> 1) & ALL_CASTLING, en_passant)
+
+    def to_fen(self):
+        """
+        Return position in FEN.
+        """
+        rows = []
+        for y_index in range(7, -1, -1):
+            row = ''
+            empty = 0
+            for x_index in range(8):
+                figure = self._figures[y_index * 8 + x_index]
+                if figure is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += FEN_LETTERS[(figure.get_owner(), figure.get_type())]
+            if empty:
+                row += str(empty)
+            rows.append(row)
+
+        castling = ''.join(letter for letter, right in FEN_CASTLING
+                           if self._castling & right) or '-'
+        en_passant = '-'
+        if self._en_passant is not None:
+            x_index, y_index = bitboard.get_position(self._en_passant)
+            en_passant = chr(x_index + 97) + str(y_index + 1)
+        player = 'w' if self._player == figures.figure.WHITE else 'b'
+
+        return ' '.join(['/'.join(rows), player, castling, en_passant,
+                         str(self._halfmove_clock), str(self._fullmove_number)])
+
+    @staticmethod
+    def from_fen(fen):
+        """
+        Create board from FEN. Move counters are optional.
+        Raises ValueError if FEN isn't valid.
+        """
+        fields = fen.split()
+        if len(fields) not in [4, 6]:
+            raise ValueError("Invalid FEN {}".format(fen))
+        placement = _parse_placement(fields[0])
+        if fields[1] not in FEN_PLAYERS:
+            raise ValueError("Invalid FEN player {}".format(fields[1]))
+        castling = 0
+        if fields[2] != '-':
+            letters = dict(FEN_CASTLING)
+            for letter in fields[2]:
+                if letter not in letters:
+                    raise ValueError("Invalid FEN castling {}".format(fields[2]))
+                castling |= letters[letter]
+        en_passant = None
+        if fields[3] != '-':
+            if (len(fields[3]) != 2 or fields[3][0] not in 'abcdefgh' or
+                    fields[3][1] not in '36'):
+                raise ValueError("Invalid FEN en passant {}".format(fields[3]))
+            en_passant = (ord(fields[3][0]) - 97, int(fields[3][1]) - 1)
+
+        board = Board._from_placement(
+            placement, FEN_PLAYERS[fields[1]], castling, en_passant)
+        if len(fields) == 6:
+            if not (fields[4].isdigit() and fields[5].isdigit()):
+                raise ValueError("Invalid FEN move counters {}".format(fen))
+            board._halfmove_clock = int(fields[4])
+            board._fullmove_number = max(1, int(fields[5]))
+
+        return board
+
+    @staticmethod
+    def _from_placement(placement, player, castling, en_passant):
+        """
+        Create board from list of (square, color, type), player on move,
+        castling rights and en passant position.
+        """
+        board = Board(EMPTY_STATE)
+        board._init_figures(placement)
+        board._init_attacks()
+        board.set_player(player)
+        board.set_castling(castling)
+        board.set_en_passant(en_passant)
+
+        return board
+
+    def _test_position(self, x_index, y_index, owner=None):
         """
         Test if the figure on position is threaten by other figure.
+        If owner is provided, position is tested for figure of this owner
+        (this is needed for empty positions).
         """
-        test_figure = self.get_figure(x_index, y_index)
-
-        for (position_x, position_y) in itertools.product(range(8), repeat=2):
-            fig = self.get_figure(position_x, position_y)
-            if fig:
-                owner = fig.get_owner()
-                logging.info(
-                    "Testing figure on position %s:%s with color %s",
-                    position_x,
-                    position_y,
-                    owner)
-                # Don't test owner figures
-                if owner != test_figure.get_owner():
-                    # Oponent figure can be moved to destination
-                    logging.info("Testing if %s can be moved to %s:%s",
-                                 fig.get_type(), x_index, y_index)
-                    if fig._test_move(x_index, y_index):
-                        return False
+        if owner is None:
+            owner = self.get_figure(x_index, y_index).get_owner()
+
+        oponent = figures.figure.get_oponent(owner)
+        if self._attack_counts[oponent][y_index * 8 + x_index]:
+            if trace.ENABLED:
+                trace.log("Position %s:%s is attacked by %s",
+                          x_index, y_index, oponent)
+            return False
 
         # Position is not threating figure
         return True
@@ -1,18 +1,32 @@
 """
 Implementation of Bishop figure in chess command line client.
 """
-import logging
-import math
+from .. import trace
 from . import figure
+from .. import bitboard
+from ..board import attacks
 
 class Bishop(figure.Figure):
     """
     Bishop figure for chess implementation.
     """
 
+    def _get_attacks(self):
+        """
+        Return bitboard of positions attacked by bishop.
+        Path to every position is clear.
+        """
+        return attacks.get_bishop_attacks(
+            self._get_square(), self._board.get_occupied())
+
     def _is_move_correct(self, x_index, y_index):
-        return (math.fabs(x_index - self._x_index) ==
-                math.fabs(y_index - self._y_index))
+        return bitboard.contains(self._get_attacks(), x_index, y_index)
+
+    def is_attacking(self, x_index, y_index):
+        return self._is_move_correct(x_index, y_index)
+
+    def _generate_targets(self):
+        return self._get_attacks() & self._get_free_targets()
 
     def _test_move(self, x_index, y_index):
         result = None
@@ -36,34 +50,33 @@ class Bishop(figure.Figure):
             if self._is_figure_on_target_position(x_index, y_index):
                 result = False
 
-            # check if path is free
-            if not self._check_vector(x_index, y_index):
-                result = False
-
             if result is None:
                 # Attack
                 target_figure = self._board.get_figure(x_index, y_index)
-                if target_figure and target_figure.get_owner != self._owner:
-                    logging.info("Attacking %s on position %s:%s",
-                                 target_figure.get_type(), x_index, y_index)
+                if target_figure and target_figure.get_owner() != self._owner:
+                    if trace.ENABLED:
+                        trace.log("Attacking %s on position %s:%s",
+                                  target_figure.get_type(), x_index, y_index)
                     result = True
                 else:
                     # Move is legal
-                    logging.info(
-                        "Bishop moved from %s:%s to %s:%s",
-                        self._x_index,
-                        self._y_index,
-                        x_index,
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Bishop moved from %s:%s to %s:%s",
+                            self._x_index,
+                            self._y_index,
+                            x_index,
+                            y_index)
                     result = True
         else:
             # Move is illegal
-            logging.info(
-                "Invalid move for bishop from %s:%s to %s:%s",
-                self._x_index,
-                self._y_index,
-                x_index,
-                y_index)
+            if trace.ENABLED:
+                trace.log(
+                    "Invalid move for bishop from %s:%s to %s:%s",
+                    self._x_index,
+                    self._y_index,
+                    x_index,
+                    y_index)
             result = False
 
         return result
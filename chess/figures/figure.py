@@ -1,8 +1,8 @@
 """
 Parent class for chess figures.
 """
-import itertools
-import logging
+from .. import trace
+from .. import bitboard
 
 # Figures enum
 PAWN = "pawn"
@@ -16,6 +16,16 @@ BLACK = "black"
 WHITE = "white"
 
 
+def get_oponent(owner):
+    """
+    Return oponent of owner.
+    """
+    if owner == WHITE:
+        return BLACK
+
+    return WHITE
+
+
 class Figure:
     """
     Parent class for chess figures. Contains all common methods.
@@ -35,7 +45,8 @@ class Figure:
         max_x = self._board.get_size()[0]
         max_y = self._board.get_size()[1]
         if x_index >= max_x or y_index >= max_y or x_index < 0 or y_index < 0:
-            logging.info("Invalid move to %s:%s", x_index, y_index)
+            if trace.ENABLED:
+                trace.log("Invalid move to %s:%s", x_index, y_index)
             return False
 
         return True
@@ -45,7 +56,8 @@ class Figure:
         Check if figure is moving.
         """
         if y_index == self._y_index and x_index == self._x_index:
-            logging.info("Invalid move to %s:%s", x_index, y_index)
+            if trace.ENABLED:
+                trace.log("Invalid move to %s:%s", x_index, y_index)
             return False
 
         return True
@@ -56,8 +68,9 @@ class Figure:
         """
         figure = self._board.get_figure(x_index, y_index)
         if figure and figure.get_type() == KING and figure.get_owner() != self._owner:
-            logging.info("King on position %s:%s can't be attacked",
-                         x_index, y_index)
+            if trace.ENABLED:
+                trace.log("King on position %s:%s can't be attacked",
+                          x_index, y_index)
             return True
 
         return False
@@ -67,12 +80,12 @@ class Figure:
         Check if there is another figure on target position.
         Player can't move figure on position where he already has another figure.
         """
-        figure = self._board.get_figure(x_index, y_index)
-        if figure.get_owner() == self._owner:
-            logging.info(
-                "There is already figure on position %s:%s",
-                x_index,
-                y_index)
+        if self._board.is_occupied_by(x_index, y_index, self._owner):
+            if trace.ENABLED:
+                trace.log(
+                    "There is already figure on position %s:%s",
+                    x_index,
+                    y_index)
             return True
 
         return False
@@ -83,34 +96,82 @@ class Figure:
         """
         raise NotImplementedError
 
-    def move_to(self, x_index, y_index, check=True):
+    def is_attacking(self, x_index, y_index):
+        """
+        Check if figure is attacking specified position.
+        Unlike _test_move this doesn't care about figure on target position.
+        """
+        return (self._is_moving(x_index, y_index) and
+                self._is_move_correct(x_index, y_index))
+
+    def move_to(self, x_index, y_index, check=True, promotion=None):
         """
         Move figure to next position.
         If check is false, then just change figure position (this is for special moves).
+        Promotion is type of figure pawn is promoted to (queen by default).
         """
         # First test if move is correct
         if (not check) or self._test_move(x_index, y_index):
-            self._board.move_figure(
-                (self._x_index, self._y_index), (x_index, y_index))
-            self._x_index = x_index
-            self._y_index = y_index
+            move = ((self._x_index, self._y_index), (x_index, y_index))
+            if promotion:
+                move += (promotion,)
+            self._board.make_move(move)
             return True
         return False
 
+    def set_position(self, x_index, y_index):
+        """
+        Change position of figure. This is called by board when figure is moved.
+        """
+        self._x_index = x_index
+        self._y_index = y_index
+
+    def get_flags(self):
+        """
+        Return flags of figure changed by moves.
+        Flags are stored by board, so the move can be taken back.
+        """
+        return ()
+
+    def set_flags(self, flags):
+        """
+        Restore flags of figure returned by get_flags.
+        """
+
     def generate_moves(self):
         """
         Generate moves for figure.
         """
         moves = []
-        list_x = range(0, self._board.get_size()[0])
-        list_y = range(0, self._board.get_size()[1])
-        logging.info("Generating moves for %s", self._figure)
-        for x_index, y_index in itertools.product(list_x, list_y):
-            if self._test_move(x_index, y_index):
-                moves.append((x_index, y_index, self._figure))
+        if trace.ENABLED:
+            trace.log("Generating moves for %s", self._figure)
+        for square in bitboard.iterate(self._generate_targets()):
+            moves.append((square & 7, square >> 3, self._figure))
 
         return moves
 
+    def _generate_targets(self):
+        """
+        Return bitboard of positions figure can be moved to.
+        Figure enumerates only its own candidate positions and validates them,
+        so the result is the same as testing every position by _test_move.
+        """
+        raise NotImplementedError
+
+    def _get_free_targets(self):
+        """
+        Return bitboard of positions which aren't occupied by owner figure
+        or oponent king.
+        """
+        return ~(self._board.get_occupied(self._owner) |
+                 self._board.get_bitboard(get_oponent(self._owner), KING))
+
+    def _get_square(self):
+        """
+        Return square index of current position.
+        """
+        return bitboard.get_square(self._x_index, self._y_index)
+
     def _test_move(self, x_index, y_index):
         """
         Test if figure can be moved to specified destination.
@@ -137,63 +198,3 @@ class Figure:
         """
 
         return self._owner
-
-    def _check_vector(self, x_index, y_index):
-        """
-        Test if movement vector is clear.
-        """
-
-        # Movement is done only in y_index axis
-        if x_index == self._x_index:
-            for move_y in self._generate_range(self._y_index, y_index):
-                # Skip current figure
-                if (x_index, move_y) == (self._x_index, self._y_index):
-                    continue
-                if self._board.get_figure(x_index, move_y):
-                    logging.info(
-                        "Figure in path on position %s:%s", x_index, move_y)
-                    return False
-
-        # Movement is done only in x_index axis
-        elif y_index == self._y_index:
-            for move_x in self._generate_range(self._x_index, x_index):
-                # Skip current figure
-                if (move_x, y_index) == (self._x_index, self._y_index):
-                    continue
-                if self._board.get_figure(move_x, y_index):
-                    logging.info(
-                        "Figure in path on position %s:%s", move_x, y_index)
-                    return False
-
-        # Movement is done in both axes
-        else:
-            list_x = self._generate_range(self._x_index, x_index)
-            list_y = self._generate_range(self._y_index, y_index)
-            for (move_x, move_y) in itertools.product(list_x, list_y):
-                # Skip current figure
-                if (move_x, move_y) == (self._x_index, self._y_index):
-                    continue
-                if self._board.get_figure(move_x, move_y):
-                    logging.info("Figure in path on position %s:%s",
-                                 move_x, move_y)
-                    return False
-
-        return True
-
-    def _generate_range(self, start, end):
-        """
-        Generate range from start to end. This method is needed for decreasing
-        ranges.
-        """
-        result = None
-        if start > end:
-            result = range(start, end, -1)
-        else:
-            result = range(start, end, 1)
-
-        logging.info(
-            "From %s to %s generated range %s",
-            start,
-            end,
-            str(result))
-        return result
@@ -1,9 +1,10 @@
 """
 Implementation of King figure in chess command line client.
 """
-import logging
+from .. import trace
 from . import figure
-from ..board import board
+from ..board import attacks
+from .. import bitboard
 
 
 class King(figure.Figure):
@@ -19,29 +20,44 @@ class King(figure.Figure):
         """
         Check if castling can be done.
         """
+        self._castling = False
         if (x_index == self._x_index + 2 or x_index ==
                 self._x_index - 2) and y_index == self._y_index:
+            # King must be on starting position
+            start_y = 0 if self._owner == figure.WHITE else 7
+            if (self._x_index, self._y_index) != (4, start_y):
+                if trace.ENABLED:
+                    trace.log("Castling can't be done, king is not in starting position")
+                return False
+            if not self._board.has_castling_right(
+                    self._owner, x_index > self._x_index):
+                if trace.ENABLED:
+                    trace.log("Castling can't be done, king or rook already moved")
+                return False
             if self.is_check():
-                logging.info("Castling can't be done, king is in check")
+                if trace.ENABLED:
+                    trace.log("Castling can't be done, king is in check")
                 return False
             if x_index < self._x_index:
-                check_range = range(x_index, self._x_index)
+                check_range = range(1, self._x_index)
                 # Check if ROOK is still on starting position
                 target_figure = self._board.get_figure(0, y_index)
                 if target_figure:
                     owner = target_figure.get_owner()
                     if not (target_figure.get_type() ==
                             figure.ROOK and owner == self._owner):
-                        logging.info(
-                            "Castling can't be done, figure on position %s:%s is not ROOK", 
-                            0, 
-                            y_index)
+                        if trace.ENABLED:
+                            trace.log(
+                                "Castling can't be done, figure on position %s:%s is not ROOK", 
+                                0, 
+                                y_index)
                         return False
                 else:
-                    logging.info(
-                        "Castling can't be done, ROOK is not in starting position %s:%s", 
-                        0, 
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Castling can't be done, ROOK is not in starting position %s:%s", 
+                            0, 
+                            y_index)
                     return False
             else:
                 check_range = range(self._x_index + 1, x_index + 1)
@@ -51,40 +67,82 @@ class King(figure.Figure):
                     owner = target_figure.get_owner()
                     if not (target_figure.get_type() ==
                             figure.ROOK and owner == self._owner):
-                        logging.info(
-                            "Castling can't be done, figure on position %s:%s is not ROOK",
-                            7,
-                            y_index)
+                        if trace.ENABLED:
+                            trace.log(
+                                "Castling can't be done, figure on position %s:%s is not ROOK",
+                                7,
+                                y_index)
                         return False
                 else:
-                    logging.info(
-                        "Castling can't be done, ROOK is not in starting position %s:%s",
-                        7,
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Castling can't be done, ROOK is not in starting position %s:%s",
+                            7,
+                            y_index)
                     return False
 
             for i in check_range:
                 target_figure = self._board.get_figure(i, y_index)
                 if target_figure:
-                    logging.info(
-                        "Castling can't be done, there is figure on position %s:%s", i, y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Castling can't be done, there is figure on position %s:%s", i, y_index)
                     return False
 
+            # King can't pass through threatened position
+            passing_x = (self._x_index + x_index) // 2
+            if not self._board._test_position(passing_x, y_index, self._owner):
+                if trace.ENABLED:
+                    trace.log(
+                        "Castling can't be done, position %s:%s is threatened", passing_x, y_index)
+                return False
+
             self._castling = True
 
+        return True
+
     def _is_move_correct(self, x_index, y_index):
-        x_range = [self._x_index - 1, self._x_index + 1]
-        y_range = [self._y_index - 1, self._y_index + 1]
         castling_range = [self._x_index - 2, self._x_index + 2]
-        # x_index +/- 1 and y_index +/- 1
-        return ((x_index in x_range and y_index in y_range) or
-                # x_index +/- 1
-                (x_index in x_range and y_index == self._y_index) or
-                # y_index +/- 1
-                (y_index in y_range and x_index == self._x_index) or
+        return (bitboard.contains(
+            attacks.KING_ATTACKS[self._get_square()], x_index, y_index) or
                 # castling
                 (x_index in castling_range and y_index == self._y_index))
 
+    def _generate_targets(self):
+        targets = bitboard.EMPTY
+        candidates = (attacks.KING_ATTACKS[self._get_square()] &
+                      self._get_free_targets())
+        # castling
+        start_y = 0 if self._owner == figure.WHITE else 7
+        if (self._x_index, self._y_index) == (4, start_y):
+            for x_index in [2, 6]:
+                if self._check_castling(x_index, start_y):
+                    candidates |= bitboard.get_bit(x_index, start_y)
+            self._castling = False
+
+        # Check if no oponnent figure can be moved to king destination
+        for square in bitboard.iterate(candidates):
+            x_index, y_index = bitboard.get_position(square)
+            if self._is_position_safe(x_index, y_index):
+                targets |= 1 << square
+
+        return targets
+
+    def _is_position_safe(self, x_index, y_index):
+        """
+        Check if no oponent figure is attacking position.
+        """
+        if not self._board._test_position(x_index, y_index, self._owner):
+            return False
+
+        # King is blocking the attack on positions behind it
+        if self.is_check():
+            occupied = self._board.get_occupied() & ~(1 << self._get_square())
+            return not self._board.get_attackers(
+                x_index, y_index, figure.get_oponent(self._owner), occupied)
+
+        return True
+
     def _test_move(self, x_index, y_index):
         result = None
 
@@ -112,44 +170,58 @@ class King(figure.Figure):
                 result = False
 
             # Check if no oponnent figure can be moved to king destination
-            if not self._test_position(x_index, y_index):
-                logging.info("Oponent figure can move to %s:%s",
-                             x_index, y_index)
+            if not self._is_position_safe(x_index, y_index):
+                if trace.ENABLED:
+                    trace.log("Oponent figure can move to %s:%s",
+                              x_index, y_index)
                 result = False
 
             if result is None:
                 target_figure = self._board.get_figure(x_index, y_index)
                 # Attack
                 if target_figure and target_figure.get_owner() != self._owner:
-                    logging.info("Attacking %s on position %s:%s",
-                                 target_figure.get_type(), x_index, y_index)
+                    if trace.ENABLED:
+                        trace.log("Attacking %s on position %s:%s",
+                                  target_figure.get_type(), x_index, y_index)
                     result = True
                 # Move is legal
                 else:
-                    logging.info(
-                        "King moved from %s:%s to %s:%s",
-                        self._x_index,
-                        self._y_index,
-                        x_index,
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "King moved from %s:%s to %s:%s",
+                            self._x_index,
+                            self._y_index,
+                            x_index,
+                            y_index)
                     result = True
         else:
             # Move is illegal
-            logging.info(
-                "Invalid move for king from %s:%s to %s:%s",
-                self._x_index,
-                self._y_index,
-                x_index,
-                y_index)
+            if trace.ENABLED:
+                trace.log(
+                    "Invalid move for king from %s:%s to %s:%s",
+                    self._x_index,
+                    self._y_index,
+                    x_index,
+                    y_index)
             result = False
 
         return result
 
+    def is_attacking(self, x_index, y_index):
+        return bitboard.contains(
+            attacks.KING_ATTACKS[self._get_square()], x_index, y_index)
+
     def is_check(self):
         """
         Check if king is in check.
         """
-        return not self._board.test_position(self._x_index, self._y_index)
+        return not self._board._test_position(self._x_index, self._y_index)
+
+    def get_flags(self):
+        return (self._castling,)
+
+    def set_flags(self, flags):
+        self._castling = flags[0]
 
     def is_castling(self):
         """
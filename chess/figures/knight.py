@@ -1,9 +1,10 @@
 """
 Implementation of Knight figure in chess command line client.
 """
-import logging
+from .. import trace
 from . import figure
-from ..board import board
+from .. import bitboard
+from ..board import attacks
 
 
 class Knight(figure.Figure):
@@ -12,10 +13,15 @@ class Knight(figure.Figure):
     """
 
     def _is_move_correct(self, x_index, y_index):
-            # x_index +/- 2 and y_index +/- 3
-        return ((x_index - self._x_index in [-1, 1] and y_index - self._y_index in [-2, 2]) or
-                # x_index +/- 3 and y_index +/- 2
-                (x_index - self._x_index in [-2, 2] and y_index - self._y_index in [-1, 1]))
+        return bitboard.contains(
+            attacks.KNIGHT_ATTACKS[self._get_square()], x_index, y_index)
+
+    def is_attacking(self, x_index, y_index):
+        return self._is_move_correct(x_index, y_index)
+
+    def _generate_targets(self):
+        return (attacks.KNIGHT_ATTACKS[self._get_square()] &
+                self._get_free_targets())
 
     def _test_move(self, x_index, y_index):
         result = None
@@ -43,26 +49,29 @@ class Knight(figure.Figure):
                 # Attack
                 target_figure = self._board.get_figure(x_index, y_index)
                 if target_figure and target_figure.get_owner() != self._owner:
-                    logging.info("Attacking %s on position %s:%s",
-                                 target_figure.get_type(), x_index, y_index)
+                    if trace.ENABLED:
+                        trace.log("Attacking %s on position %s:%s",
+                                  target_figure.get_type(), x_index, y_index)
                     result = True
                 # Move is legal
                 else:
-                    logging.info(
-                        "Knight moved from %s:%s to %s:%s",
-                        self._x_index,
-                        self._y_index,
-                        x_index,
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Knight moved from %s:%s to %s:%s",
+                            self._x_index,
+                            self._y_index,
+                            x_index,
+                            y_index)
                     result = True
         else:
             # Move is illegal
-            logging.info(
-                "Invalid move for knight from %s:%s to %s:%s",
-                self._x_index,
-                self._y_index,
-                x_index,
-                y_index)
+            if trace.ENABLED:
+                trace.log(
+                    "Invalid move for knight from %s:%s to %s:%s",
+                    self._x_index,
+                    self._y_index,
+                    x_index,
+                    y_index)
             result = False
 
         return result
@@ -1,9 +1,13 @@
 """
 Implementation of Pawn figure in chess command line client.
 """
-import logging
+from .. import trace
 from . import figure
-from ..board import Board
+from .. import bitboard
+from ..board import attacks
+
+# Figures pawn can be promoted to
+PROMOTIONS = [figure.QUEEN, figure.ROOK, figure.BISHOP, figure.KNIGHT]
 
 
 class Pawn(figure.Figure):
@@ -22,10 +26,12 @@ class Pawn(figure.Figure):
         Check if figure is moving in correct direction.
         """
         if y_index < self._y_index and self._owner == figure.WHITE:
-            logging.info("Invalid move to %s:%s", x_index, y_index)
+            if trace.ENABLED:
+                trace.log("Invalid move to %s:%s", x_index, y_index)
             return False
         if y_index > self._y_index and self._owner == figure.BLACK:
-            logging.info("Invalid move to %s:%s", x_index, y_index)
+            if trace.ENABLED:
+                trace.log("Invalid move to %s:%s", x_index, y_index)
             return False
 
         return True
@@ -41,19 +47,19 @@ class Pawn(figure.Figure):
                 (x_index == self._x_index - 1 and y_diff in [-1, 1])):
             target_figure = self._board.get_figure(x_index, y_index)
             if target_figure and target_figure.get_owner() != self._owner:
-                logging.info("Attacking %s on position %s:%s",
-                             target_figure.get_type(),
-                             x_index,
-                             y_index)
+                if trace.ENABLED:
+                    trace.log("Attacking %s on position %s:%s",
+                              target_figure.get_type(),
+                              x_index,
+                              y_index)
                 return True
             # En passant
-            if (target_figure and
-                    target_figure.get_owner() != self._owner and
-                    target_figure.get_type() == figure.PAWN):
-                logging.info("En passant on position %s:%s",
-                             x_index,
-                             y_index)
-                self._passant=True
+            if self._board.get_en_passant() == (x_index, y_index):
+                if trace.ENABLED:
+                    trace.log("En passant on position %s:%s",
+                              x_index,
+                              y_index)
+                self._passant = True
                 return True
 
         return False
@@ -63,8 +69,9 @@ class Pawn(figure.Figure):
         Check if this move is first move.
         In first move Pawn can be moved differently.
         """
-        # First move can be two squares forward
-        if x_index == self._x_index and (
+        # First move can be two squares forward from starting position
+        start_y = 1 if self._owner == figure.WHITE else 6
+        if self._y_index == start_y and x_index == self._x_index and (
                 y_index == self._y_index + 2 or y_index == self._y_index - 2):
             if y_index > self._y_index:
                 check_range = range(self._y_index + 1, y_index + 1)
@@ -74,29 +81,70 @@ class Pawn(figure.Figure):
             for i in check_range:
                 target_figure = self._board.get_figure(x_index, i)
                 if target_figure:
-                    logging.info(
-                        "Move can't be done, figure on path %s:%s", x_index, i)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Move can't be done, figure on path %s:%s", x_index, i)
                     return False
 
             # Check if en passant can be done in next move
-            target_figure = self._board.get_figure(x_index + 1, y_index)
-            if (target_figure
-                    and target_figure.get_type() == figure.PAWN and
-                    target_figure.get_owner() != self._owner):
-                self._passant_danger = True
-            target_figure = self._board.get_figure(x_index - 1, y_index)
-            if (target_figure
-                    and target_figure.get_type() == figure.PAWN and
-                    target_figure.get_owner() != self._owner):
-                self._passant_danger = True
+            for neighbour_x in [x_index - 1, x_index + 1]:
+                if not 0 <= neighbour_x < self._board.get_size()[0]:
+                    continue
+                target_figure = self._board.get_figure(neighbour_x, y_index)
+                if (target_figure
+                        and target_figure.get_type() == figure.PAWN and
+                        target_figure.get_owner() != self._owner):
+                    self._passant_danger = True
 
             return True
 
         return False
 
     def _is_move_correct(self, x_index, y_index):
+        # Pawn can't capture figure in front of it
         return (x_index == self._x_index and
-                (y_index == self._y_index + 1 or y_index == self._y_index - 1))
+                (y_index == self._y_index + 1 or y_index == self._y_index - 1) and
+                self._is_move_inside_board(x_index, y_index) and
+                not self._board.get_figure(x_index, y_index))
+
+    def is_attacking(self, x_index, y_index):
+        return bitboard.contains(
+            attacks.PAWN_ATTACKS[self._owner][self._get_square()],
+            x_index, y_index)
+
+    def _generate_targets(self):
+        square = self._get_square()
+        empty = ~self._board.get_occupied()
+        targets = attacks.PAWN_PUSHES[self._owner][square] & empty
+        # Move two squares forward only if path is clear
+        if targets:
+            targets |= attacks.PAWN_DOUBLE_PUSHES[self._owner][square] & empty
+        # Attack
+        targets |= (attacks.PAWN_ATTACKS[self._owner][square] &
+                    self._board.get_occupied(figure.get_oponent(self._owner)) &
+                    self._get_free_targets())
+        # En passant
+        en_passant = self._board.get_en_passant()
+        if en_passant:
+            targets |= (attacks.PAWN_ATTACKS[self._owner][square] &
+                        bitboard.get_bit(*en_passant))
+        return targets
+
+    def generate_moves(self):
+        """
+        Generate moves for pawn.
+        Move to the last row is generated for every figure pawn can be promoted to,
+        so the figure type in move is type of figure after the move.
+        """
+        moves = []
+        for x_index, y_index, fig in super().generate_moves():
+            if y_index in [0, self._board.get_size()[1] - 1]:
+                for promotion in PROMOTIONS:
+                    moves.append((x_index, y_index, promotion))
+            else:
+                moves.append((x_index, y_index, fig))
+
+        return moves
 
     def _test_move(self, x_index, y_index):
         result = None
@@ -134,26 +182,35 @@ class Pawn(figure.Figure):
                 target_figure = self._board.get_figure(x_index, y_index)
                 if (y_index == self._board.get_size()[1] - 1 or y_index ==
                         0) and not target_figure:
-                    logging.info("Pawn got promotion")
+                    if trace.ENABLED:
+                        trace.log("Pawn got promotion")
                     self._promotion = True
                     result = True
                 else:
-                    logging.info(
-                        "Pawn moved from %s:%s to %s:%s",
-                        self._x_index,
-                        self._y_index,
-                        x_index,
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Pawn moved from %s:%s to %s:%s",
+                            self._x_index,
+                            self._y_index,
+                            x_index,
+                            y_index)
                     result = True
 
         else:
             # Move is illegal
-            logging.info("Invalid move for pawn from %s:%s to %s:%s", self._x_index,
-                         self._y_index, x_index, y_index)
+            if trace.ENABLED:
+                trace.log("Invalid move for pawn from %s:%s to %s:%s", self._x_index,
+                          self._y_index, x_index, y_index)
             result = False
 
         return result
 
+    def get_flags(self):
+        return (self._promotion, self._passant, self._passant_danger)
+
+    def set_flags(self, flags):
+        self._promotion, self._passant, self._passant_danger = flags
+
     def is_en_passant(self):
         """
         Returns true, whether en passant was done in last move.
@@ -1,10 +1,10 @@
 """
 Implementation of Bishop figure in chess command line client.
 """
-import logging
-import math
+from .. import trace
 from . import figure
-from ..board import Board
+from .. import bitboard
+from ..board import attacks
 
 
 class Queen(figure.Figure):
@@ -12,14 +12,22 @@ class Queen(figure.Figure):
     Queen figure for chess implementation.
     """
 
+    def _get_attacks(self):
+        """
+        Return bitboard of positions attacked by queen.
+        Path to every position is clear.
+        """
+        return attacks.get_queen_attacks(
+            self._get_square(), self._board.get_occupied())
+
     def _is_move_correct(self, x_index, y_index):
-                # Move x_index or y_index
-        return (((x_index < self._x_index or x_index > self._x_index) and
-                 y_index == self._y_index or
-                 (y_index < self._y_index or y_index > self._y_index) and
-                 x_index == self._x_index) or
-                # Move diagonally
-                (math.fabs(x_index - self._x_index) == math.fabs(y_index - self._y_index)))
+        return bitboard.contains(self._get_attacks(), x_index, y_index)
+
+    def is_attacking(self, x_index, y_index):
+        return self._is_move_correct(x_index, y_index)
+
+    def _generate_targets(self):
+        return self._get_attacks() & self._get_free_targets()
 
     def _test_move(self, x_index, y_index):
         result = None
@@ -43,34 +51,33 @@ class Queen(figure.Figure):
             if self._is_figure_on_target_position(x_index, y_index):
                 result = False
 
-            # check if path is free
-            if not self._check_vector(x_index, y_index):
-                result = False
-
             if result is None:
                 target_figure = self._board.get_figure(x_index, y_index)
                 # Attack
                 if target_figure and target_figure.get_owner() != self._owner:
-                    logging.info("Attacking %s on position %s:%s",
-                                 target_figure.get_type(), x_index, y_index)
+                    if trace.ENABLED:
+                        trace.log("Attacking %s on position %s:%s",
+                                  target_figure.get_type(), x_index, y_index)
                     result = True
                 else:
-                    logging.info(
-                        "Queen moved from %s:%s to %s:%s",
-                        self._x_index,
-                        self._y_index,
-                        x_index,
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Queen moved from %s:%s to %s:%s",
+                            self._x_index,
+                            self._y_index,
+                            x_index,
+                            y_index)
                     result = True
 
         else:
             # Move is illegal
-            logging.info(
-                "Invalid move for queen from %s:%s to %s:%s",
-                self._x_index,
-                self._y_index,
-                x_index,
-                y_index)
+            if trace.ENABLED:
+                trace.log(
+                    "Invalid move for queen from %s:%s to %s:%s",
+                    self._x_index,
+                    self._y_index,
+                    x_index,
+                    y_index)
             result = False
 
         return result
@@ -1,9 +1,10 @@
 """
 Implementation of Rook figure in chess command line client.
 """
-import logging
+from .. import trace
 from . import figure
-from ..board import Board
+from .. import bitboard
+from ..board import attacks
 
 
 class Rook(figure.Figure):
@@ -11,12 +12,22 @@ class Rook(figure.Figure):
     Rook figure for chess implementation.
     """
 
+    def _get_attacks(self):
+        """
+        Return bitboard of positions attacked by rook.
+        Path to every position is clear.
+        """
+        return attacks.get_rook_attacks(
+            self._get_square(), self._board.get_occupied())
+
     def _is_move_correct(self, x_index, y_index):
-                #  Move only in x_index axis
-        return (((x_index > self._x_index or x_index < self._x_index) and
-                 y_index == self._y_index) or
-                # Move only in y_index axis
-                (x_index == self._x_index and (y_index > self._y_index or y_index < self._y_index)))
+        return bitboard.contains(self._get_attacks(), x_index, y_index)
+
+    def is_attacking(self, x_index, y_index):
+        return self._is_move_correct(x_index, y_index)
+
+    def _generate_targets(self):
+        return self._get_attacks() & self._get_free_targets()
 
     def _test_move(self, x_index, y_index):
         result = None
@@ -40,34 +51,33 @@ class Rook(figure.Figure):
             if self._is_figure_on_target_position(x_index, y_index):
                 result = False
 
-            # check if path is free
-            if not self._check_vector(x_index, y_index):
-                result = False
-
             if result is None:
                 target_figure = self._board.get_figure(x_index, y_index)
                 # Attack
                 if target_figure and target_figure.get_owner() != self._owner:
-                    logging.info("Attacking %s on position %s:%s",
-                                 target_figure.get_type(), x_index, y_index)
+                    if trace.ENABLED:
+                        trace.log("Attacking %s on position %s:%s",
+                                  target_figure.get_type(), x_index, y_index)
                     result = True
                 # Move is legal
                 else:
-                    logging.info(
-                        "Rook moved from %s:%s to %s:%s",
-                        self._x_index,
-                        self._y_index,
-                        x_index,
-                        y_index)
+                    if trace.ENABLED:
+                        trace.log(
+                            "Rook moved from %s:%s to %s:%s",
+                            self._x_index,
+                            self._y_index,
+                            x_index,
+                            y_index)
                     result = True
         else:
             # Move is illegal
-            logging.info(
-                "Invalid move for rook from %s:%s to %s:%s",
-                self._x_index,
-                self._y_index,
-                x_index,
-                y_index)
+            if trace.ENABLED:
+                trace.log(
+                    "Invalid move for rook from %s:%s to %s:%s",
+                    self._x_index,
+                    self._y_index,
+                    x_index,
+                    y_index)
             result = False
 
         return result
@@ -0,0 +1,8 @@
+"""
+Initialization of search package.
+"""
+from .transposition import TranspositionTable
+from .evaluation import evaluate
+from .ordering import MoveOrdering
+from .see import see
+from . import transposition
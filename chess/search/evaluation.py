@@ -0,0 +1,72 @@
+"""
+Static evaluation of position.
+Position is evaluated by material and by placement of figures, score is in
+centipawns from the view of player on move.
+"""
+from ..figures import figure
+from .. import bitboard
+
+FIGURE_VALUES = {
+    figure.PAWN: 100,
+    figure.KNIGHT: 320,
+    figure.BISHOP: 330,
+    figure.ROOK: 500,
+    figure.QUEEN: 900,
+    figure.KING: 0}
+
+# Bonus for every step from the edge of board
+CENTER_WEIGHTS = {
+    figure.PAWN: 0,
+    figure.KNIGHT: 6,
+    figure.BISHOP: 3,
+    figure.ROOK: 0,
+    figure.QUEEN: 1,
+    figure.KING: 0}
+# Bonus for every row pawn advanced
+PAWN_ADVANCE = 6
+
+
+def _init_placement_table(figure_type, owner):
+    """
+    Generate table of placement bonuses for figure type of owner.
+    """
+    table = []
+    for square in range(64):
+        x_index, y_index = bitboard.get_position(square)
+        center = min(x_index, 7 - x_index) + min(y_index, 7 - y_index)
+        bonus = center * CENTER_WEIGHTS[figure_type]
+        if figure_type == figure.PAWN:
+            if owner == figure.WHITE:
+                bonus += (y_index - 1) * PAWN_ADVANCE
+            else:
+                bonus += (6 - y_index) * PAWN_ADVANCE
+        table.append(FIGURE_VALUES[figure_type] + bonus)
+
+    return table
+
+
+# Value of figure including placement bonus indexed by owner, type and square
+PLACEMENT = {
+    owner: {figure_type: _init_placement_table(figure_type, owner)
+            for figure_type in FIGURE_VALUES}
+    for owner in [figure.WHITE, figure.BLACK]}
+
+
+def evaluate(board):
+    """
+    Evaluate position on board from the view of player on move.
+    """
+    player = board.get_player()
+    score = 0
+    for owner in [figure.WHITE, figure.BLACK]:
+        table = PLACEMENT[owner]
+        owner_score = 0
+        for fig in board.get_figures(owner):
+            x_index, y_index = fig.get_position()
+            owner_score += table[fig.get_type()][y_index * 8 + x_index]
+        if owner == player:
+            score += owner_score
+        else:
+            score -= owner_score
+
+    return score
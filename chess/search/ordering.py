@@ -0,0 +1,121 @@
+"""
+Ordering of moves for search.
+Good moves searched first lead to more cutoffs of alpha-beta search.
+Moves are ordered by: move from transposition table, captures by most
+valuable victim - least valuable attacker (MVV-LVA), killer moves (quiet
+moves which caused cutoff in the same depth) and history of cutoffs.
+"""
+from ..figures import figure
+from .evaluation import FIGURE_VALUES
+
+# Ordering scores of move kinds
+TABLE_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000
+KILLER_SCORES = (90000, 89000)
+# History scores are halved when they reach the limit
+HISTORY_LIMIT = 50000
+MAX_PLY = 128
+
+
+def _get_index(move):
+    """
+    Return index of move in history table.
+    """
+    start = move[0][1] * 8 + move[0][0]
+    target = move[1][1] * 8 + move[1][0]
+    return start * 64 + target
+
+
+class MoveOrdering:
+    """
+    Heuristics for ordering moves in search.
+    """
+
+    def __init__(self, board):
+        self._board = board
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        self._history = {
+            figure.WHITE: [0] * 4096,
+            figure.BLACK: [0] * 4096}
+
+    def new_search(self):
+        """
+        Prepare heuristics for new search.
+        Killers are removed and history is weakened.
+        """
+        for killers in self._killers:
+            killers[0] = None
+            killers[1] = None
+        for table in self._history.values():
+            for index, value in enumerate(table):
+                if value:
+                    table[index] = value // 2
+
+    def is_capture(self, move):
+        """
+        Check if move captures figure (including en passant).
+        """
+        board = self._board
+        if board.get_figure(move[1][0], move[1][1]) is not None:
+            return True
+        fig = board.get_figure(move[0][0], move[0][1])
+        return fig.get_type() == figure.PAWN and move[0][0] != move[1][0]
+
+    def order_moves(self, moves, table_move=None, ply=None):
+        """
+        Return moves sorted from the most promising.
+        Killer moves are used only if ply is specified.
+        """
+        board = self._board
+        killers = (None, None)
+        if ply is not None and ply < MAX_PLY:
+            killers = self._killers[ply]
+        history = self._history[board.get_player()]
+
+        scored = []
+        for move in moves:
+            if move == table_move:
+                score = TABLE_MOVE_SCORE
+            else:
+                attacker = board.get_figure(move[0][0], move[0][1])
+                victim = board.get_figure(move[1][0], move[1][1])
+                if victim is not None:
+                    score = (CAPTURE_SCORE +
+                             FIGURE_VALUES[victim.get_type()] * 10 -
+                             FIGURE_VALUES[attacker.get_type()] // 10)
+                elif (attacker.get_type() == figure.PAWN and
+                      move[0][0] != move[1][0]):
+                    # En passant
+                    score = (CAPTURE_SCORE +
+                             FIGURE_VALUES[figure.PAWN] * 10 -
+                             FIGURE_VALUES[figure.PAWN] // 10)
+                elif move == killers[0]:
+                    score = KILLER_SCORES[0]
+                elif move == killers[1]:
+                    score = KILLER_SCORES[1]
+                else:
+                    score = history[_get_index(move)]
+                # Promotion
+                if len(move) > 2:
+                    score += CAPTURE_SCORE + FIGURE_VALUES[move[2]]
+            scored.append((score, move))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def add_cutoff(self, move, depth, ply):
+        """
+        Remember quiet move which caused cutoff.
+        """
+        if ply < MAX_PLY:
+            killers = self._killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        history = self._history[self._board.get_player()]
+        index = _get_index(move)
+        history[index] += depth * depth
+        if history[index] >= HISTORY_LIMIT:
+            for position, value in enumerate(history):
+                history[position] = value // 2
@@ -0,0 +1,78 @@
+"""
+Static exchange evaluation (SEE).
+Resolves sequence of captures on target position of move without searching
+it. Every side recaptures with its least valuable attacker found by
+Board.get_attackers, figures behind removed attackers join the exchange
+(x-rays) because attackers are searched with reduced occupancy.
+"""
+from ..figures import figure
+from .. import bitboard
+from .evaluation import FIGURE_VALUES
+
+# Figure types from the least valuable
+ATTACKER_ORDER = (figure.PAWN, figure.KNIGHT, figure.BISHOP, figure.ROOK,
+                  figure.QUEEN, figure.KING)
+# King can't be captured, so it's more valuable than anything else
+KING_VALUE = 20000
+
+
+def _get_value(figure_type):
+    """
+    Return value of figure type in exchange.
+    """
+    if figure_type == figure.KING:
+        return KING_VALUE
+    return FIGURE_VALUES[figure_type]
+
+
+def see(board, move):
+    """
+    Return material gain of move for player on move when both players
+    capture on target position as long as it's profitable.
+    """
+    (start_x, start_y), (target_x, target_y) = move[0], move[1]
+    attacker = board.get_figure(start_x, start_y)
+    victim = board.get_figure(target_x, target_y)
+    occupied = board.get_occupied()
+    if victim is not None:
+        gains = [_get_value(victim.get_type())]
+    elif attacker.get_type() == figure.PAWN and start_x != target_x:
+        # En passant
+        gains = [FIGURE_VALUES[figure.PAWN]]
+        occupied &= ~bitboard.get_bit(target_x, start_y)
+    else:
+        gains = [0]
+
+    attacker_value = _get_value(attacker.get_type())
+    # Promotion
+    if len(move) > 2:
+        gains[0] += FIGURE_VALUES[move[2]] - FIGURE_VALUES[figure.PAWN]
+        attacker_value = FIGURE_VALUES[move[2]]
+
+    occupied &= ~bitboard.get_bit(start_x, start_y)
+    side = figure.get_oponent(attacker.get_owner())
+    while True:
+        attackers = board.get_attackers(
+            target_x, target_y, side, occupied) & occupied
+        if not attackers:
+            break
+        for figure_type in ATTACKER_ORDER:
+            candidates = attackers & board.get_bitboard(side, figure_type)
+            if candidates:
+                break
+        # King can't capture defended figure
+        if (figure_type == figure.KING and
+                board.get_attackers(target_x, target_y,
+                                    figure.get_oponent(side),
+                                    occupied) & occupied):
+            break
+        gains.append(attacker_value - gains[-1])
+        attacker_value = _get_value(figure_type)
+        occupied &= ~(candidates & -candidates)
+        side = figure.get_oponent(side)
+
+    # Every player can stop capturing if it isn't profitable
+    for index in range(len(gains) - 1, 0, -1):
+        gains[index - 1] = -max(-gains[index - 1], gains[index])
+
+    return gains[0]
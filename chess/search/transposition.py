@@ -0,0 +1,178 @@
+"""
+Transposition table for search.
+Table has fixed size given in MB and is stored in one bytearray, so memory
+doesn't grow during long running search. Every bucket contains two entries,
+first is replaced only by deeper search or by entry from newer search
+(depth-preferred), second is replaced always.
+Table can be stored also in shared memory buffer and used by more processes
+at once. Entry contains key XORed with its data, so entry overwritten by
+other process in the middle of reading doesn't match the key.
+"""
+import struct
+from ..figures import figure
+
+# Bound types
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# Entry: key XOR data, data (score, move, depth, bound, age)
+ENTRY = struct.Struct('<QQ')
+SCORE_OFFSET = 1 << 23
+DEPTH_OFFSET = 128
+ENTRIES_IN_BUCKET = 2
+BUCKET_SIZE = ENTRY.size * ENTRIES_IN_BUCKET
+MAX_AGE = 256
+
+# Promotion types stored in move (0 is no promotion)
+PROMOTIONS = (None, figure.KNIGHT, figure.BISHOP, figure.ROOK, figure.QUEEN)
+
+
+def encode_move(move):
+    """
+    Encode move (start, target) or (start, target, promotion) to number.
+    Value 0 means no move.
+    """
+    if move is None:
+        return 0
+    start = move[0][1] * 8 + move[0][0]
+    target = move[1][1] * 8 + move[1][0]
+    promotion = 0
+    if len(move) > 2:
+        promotion = PROMOTIONS.index(move[2])
+
+    return start | target << 6 | promotion << 12
+
+
+def decode_move(value):
+    """
+    Decode move from number created by encode_move.
+    """
+    if not value:
+        return None
+    start = ((value & 7), (value >> 3) & 7)
+    target = ((value >> 6) & 7, (value >> 9) & 7)
+    promotion = (value >> 12) & 7
+    if promotion:
+        return (start, target, PROMOTIONS[promotion])
+
+    return (start, target)
+
+
+def _pack_data(score, move, depth, bound, age):
+    """
+    Pack entry data to one 64 bit number.
+    """
+    return ((score + SCORE_OFFSET) | move << 24 | (depth + DEPTH_OFFSET) << 40 |
+            bound << 48 | age << 56)
+
+
+def _unpack_data(data):
+    """
+    Unpack entry data to tuple (score, move, depth, bound, age).
+    """
+    return ((data & 0xffffff) - SCORE_OFFSET, (data >> 24) & 0xffff,
+            ((data >> 40) & 0xff) - DEPTH_OFFSET, (data >> 48) & 0xff,
+            data >> 56)
+
+
+class TranspositionTable:
+    """
+    Fixed size table of searched positions indexed by zobrist hash.
+    """
+
+    def __init__(self, size_mb=16, buffer=None):
+        if buffer is None:
+            buffer = bytearray(
+                max(1, size_mb * 1024 * 1024 // BUCKET_SIZE) * BUCKET_SIZE)
+        self._buckets = len(buffer) // BUCKET_SIZE
+        self._data = buffer
+        self._age = 0
+
+    def get_buffer(self):
+        """
+        Return buffer with entries of table.
+        """
+        return self._data
+
+    def get_age(self):
+        """
+        Return age of current search.
+        """
+        return self._age
+
+    def set_age(self, age):
+        """
+        Set age of current search (used by tables sharing buffer).
+        """
+        self._age = age % MAX_AGE
+
+    def get_size(self):
+        """
+        Return number of buckets in table.
+        """
+        return self._buckets
+
+    def clear(self):
+        """
+        Remove all entries from table.
+        """
+        self._data[:] = bytes(len(self._data))
+        self._age = 0
+
+    def new_search(self):
+        """
+        Start new search. Entries from older searches are replaced first.
+        """
+        self._age = (self._age + 1) % MAX_AGE
+
+    def probe(self, key):
+        """
+        Find entry for position hash.
+        Returns tuple (move, bound, depth, score) or None if position
+        isn't in table.
+        """
+        offset = (key % self._buckets) * BUCKET_SIZE
+        for _ in range(ENTRIES_IN_BUCKET):
+            entry_key, data = ENTRY.unpack_from(self._data, offset)
+            if data and entry_key ^ data == key:
+                score, move, depth, bound, _ = _unpack_data(data)
+                return (decode_move(move), bound, depth, score)
+            offset += ENTRY.size
+
+        return None
+
+    def store(self, key, move, bound, depth, score):
+        """
+        Store result of search for position hash.
+        """
+        offset = (key % self._buckets) * BUCKET_SIZE
+        entry_key, data = ENTRY.unpack_from(self._data, offset)
+        _, stored_move, entry_depth, _, entry_age = _unpack_data(data)
+        # Depth-preferred entry is kept unless it's the same position,
+        # older search or shallower search
+        if (entry_key ^ data != key and data and entry_age == self._age and
+                entry_depth > depth):
+            offset += ENTRY.size
+            entry_key, data = ENTRY.unpack_from(self._data, offset)
+            stored_move = _unpack_data(data)[1]
+
+        encoded = encode_move(move)
+        # Keep best move of previous search of the same position
+        if not encoded and data and entry_key ^ data == key:
+            encoded = stored_move
+        data = _pack_data(score, encoded, depth, bound, self._age)
+        ENTRY.pack_into(self._data, offset, key ^ data, data)
+
+    def get_usage(self):
+        """
+        Return permille of used entries from current search.
+        """
+        sample = min(self._buckets, 1000)
+        used = 0
+        for index in range(sample * ENTRIES_IN_BUCKET):
+            _, data = ENTRY.unpack_from(self._data, index * ENTRY.size)
+            if data and data >> 56 == self._age:
+                used += 1
+
+        return used * 1000 // (sample * ENTRIES_IN_BUCKET)
@@ -0,0 +1,28 @@
+"""
+Trace of move generation and move tests.
+Trace is disabled by default and call sites in hot paths only check the flag
+before anything else:
+
+    if trace.ENABLED:
+        trace.log("Invalid move to %s:%s", x_index, y_index)
+
+so disabled trace doesn't call logging or format any argument.
+"""
+import logging
+
+ENABLED = False
+
+
+def enable(enabled=True):
+    """
+    Enable or disable trace.
+    """
+    global ENABLED
+    ENABLED = enabled
+
+
+def log(message, *args):
+    """
+    Write trace message to log with INFO level.
+    """
+    logging.info(message, *args)
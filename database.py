@@ -0,0 +1,311 @@
+"""
+Binary game database.
+Database consists of three files read through mmap:
+- games file (path.games) with appended game records: number of moves,
+  result, start position in binary form (see Board.to_bytes) and moves
+  packed to 2 bytes,
+- postings file (path.postings) with appended postings: offset of game and
+  offset of previous posting of the same position,
+- index file (path.index) with hash table (open addressing) from zobrist
+  hash of position to its last posting.
+Every position has one entry in index, so adding game and finding games by
+position reads only a few entries of the index and then the postings.
+"""
+#!/bin/python3
+import argparse
+import logging
+import mmap
+import os
+import struct
+from chess.board import Board
+from chess.board.board import BINARY_SIZE
+from chess.search import transposition
+
+GAMES_MAGIC = b'CHESSGM1'
+INDEX_MAGIC = b'CHESSIX2'
+POSTINGS_MAGIC = b'CHESSPS1'
+# Game record: number of moves, result, start position, moves
+RECORD_HEADER = struct.Struct('<HB')
+MOVE = struct.Struct('<H')
+# Index: magic, number of slots, number of used slots; entry: key, offset
+# of the last posting (0 is empty slot)
+INDEX_HEADER = struct.Struct('<8sQQ')
+INDEX_ENTRY = struct.Struct('<QQ')
+# Posting: offset of game, offset of previous posting (0 is none)
+POSTING = struct.Struct('<QQ')
+INITIAL_SLOTS = 1 << 16
+RESULTS = ['*', '1-0', '0-1', '1/2-1/2']
+
+
+class GameDatabase:
+    """
+    Append-only database of games indexed by positions.
+    """
+
+    def __init__(self, path, writable=False):
+        self._writable = writable
+        self._games_path = path + '.games'
+        self._index_path = path + '.index'
+        self._postings_path = path + '.postings'
+        if writable and not os.path.exists(self._games_path):
+            with open(self._games_path, 'wb') as games_file:
+                games_file.write(GAMES_MAGIC)
+            with open(self._postings_path, 'wb') as postings_file:
+                postings_file.write(POSTINGS_MAGIC)
+            self._create_index(INITIAL_SLOTS, [])
+
+        mode = 'r+b' if writable else 'rb'
+        self._games_file = open(self._games_path, mode)
+        self._games_map = None
+        self._games_size = 0
+        self._map_games()
+        if self._games_map[:len(GAMES_MAGIC)] != GAMES_MAGIC:
+            raise ValueError("Invalid games file {}".format(self._games_path))
+        self._postings_file = open(self._postings_path, mode)
+        self._postings_map = None
+        self._postings_size = 0
+        self._map_postings()
+        if self._postings_map[:len(POSTINGS_MAGIC)] != POSTINGS_MAGIC:
+            raise ValueError(
+                "Invalid postings file {}".format(self._postings_path))
+        self._index_file = None
+        self._index_map = None
+        self._slots = 0
+        self._used = 0
+        self._map_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Close files of database.
+        """
+        self._games_map.close()
+        self._games_file.close()
+        self._postings_map.close()
+        self._postings_file.close()
+        self._index_map.close()
+        self._index_file.close()
+
+    def _map_games(self):
+        """
+        Map games file to memory (again after it grew).
+        """
+        if self._games_map is not None:
+            self._games_map.close()
+        self._games_size = os.path.getsize(self._games_path)
+        self._games_map = mmap.mmap(self._games_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+
+    def _map_postings(self):
+        """
+        Map postings file to memory (again after it grew).
+        """
+        if self._postings_map is not None:
+            self._postings_map.close()
+        self._postings_size = os.path.getsize(self._postings_path)
+        self._postings_map = mmap.mmap(self._postings_file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+
+    def _map_index(self):
+        """
+        Map index file to memory.
+        """
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_file.close()
+        self._index_file = open(self._index_path,
+                                'r+b' if self._writable else 'rb')
+        access = mmap.ACCESS_WRITE if self._writable else mmap.ACCESS_READ
+        self._index_map = mmap.mmap(self._index_file.fileno(), 0,
+                                    access=access)
+        magic, self._slots, self._used = INDEX_HEADER.unpack_from(
+            self._index_map, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError("Invalid index file {}".format(self._index_path))
+
+    def _create_index(self, slots, entries):
+        """
+        Create index file with number of slots and list of (key, posting).
+        Index is written to temporary file which replaces the old one, so
+        crash doesn't lose it and readers keep their mapping of the old one.
+        """
+        data = bytearray(INDEX_HEADER.size + slots * INDEX_ENTRY.size)
+        INDEX_HEADER.pack_into(data, 0, INDEX_MAGIC, slots, len(entries))
+        for key, posting in entries:
+            slot = key & (slots - 1)
+            while True:
+                position = INDEX_HEADER.size + slot * INDEX_ENTRY.size
+                if not INDEX_ENTRY.unpack_from(data, position)[1]:
+                    INDEX_ENTRY.pack_into(data, position, key, posting)
+                    break
+                slot = (slot + 1) & (slots - 1)
+        temporary_path = self._index_path + '.tmp'
+        with open(temporary_path, 'wb') as index_file:
+            index_file.write(data)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(temporary_path, self._index_path)
+
+    def _get_entries(self):
+        """
+        Return all (key, posting) entries of index.
+        """
+        entries = []
+        for slot in range(self._slots):
+            key, posting = INDEX_ENTRY.unpack_from(
+                self._index_map, INDEX_HEADER.size + slot * INDEX_ENTRY.size)
+            if posting:
+                entries.append((key, posting))
+
+        return entries
+
+    def _find_slot(self, key):
+        """
+        Return (position of index entry, last posting) of key, last posting
+        is 0 if key isn't in index.
+        """
+        slot = key & (self._slots - 1)
+        while True:
+            position = INDEX_HEADER.size + slot * INDEX_ENTRY.size
+            entry_key, posting = INDEX_ENTRY.unpack_from(
+                self._index_map, position)
+            if not posting or entry_key == key:
+                return (position, posting)
+            slot = (slot + 1) & (self._slots - 1)
+
+    def _set_last_posting(self, key, posting):
+        """
+        Set the last posting of key, index is resized when it's half full.
+        """
+        position, previous = self._find_slot(key)
+        if not previous:
+            if (self._used + 1) * 2 > self._slots:
+                entries = self._get_entries()
+                self._create_index(self._slots * 2, entries)
+                self._map_index()
+                position = self._find_slot(key)[0]
+            self._used += 1
+            INDEX_HEADER.pack_into(self._index_map, 0, INDEX_MAGIC,
+                                   self._slots, self._used)
+        INDEX_ENTRY.pack_into(self._index_map, position, key, posting)
+
+    def add_game(self, start, moves, result='*'):
+        """
+        Append game to database.
+        Start is position in binary form, moves are list of (start, target)
+        or (start, target, promotion) and result is one of RESULTS.
+        Returns offset of game.
+        """
+        if not self._writable:
+            raise ValueError("Database isn't opened for writing")
+        board = Board.from_bytes(start)
+        keys = [board.get_hash()]
+        data = bytearray(RECORD_HEADER.pack(len(moves), RESULTS.index(result)))
+        data += start
+        for move in moves:
+            data += MOVE.pack(transposition.encode_move(move))
+            board.make_move(move)
+            keys.append(board.get_hash())
+
+        self._games_file.seek(0, os.SEEK_END)
+        offset = self._games_file.tell()
+        self._games_file.write(data)
+        self._games_file.flush()
+
+        # Every position gets one posting per game linked to its previous one
+        keys = list(set(keys))
+        postings = bytearray()
+        for key in keys:
+            postings += POSTING.pack(offset, self._find_slot(key)[1])
+        self._postings_file.seek(0, os.SEEK_END)
+        posting = self._postings_file.tell()
+        self._postings_file.write(postings)
+        self._postings_file.flush()
+
+        # Postings are published in index only after they are written
+        for key in keys:
+            self._set_last_posting(key, posting)
+            posting += POSTING.size
+        self._index_map.flush()
+        logging.debug("Game with %s moves added on %s", len(moves), offset)
+
+        return offset
+
+    def find_games(self, key):
+        """
+        Return offsets of games which reached position with zobrist hash key.
+        """
+        offsets = []
+        posting = self._find_slot(key)[1]
+        if posting >= self._postings_size:
+            self._map_postings()
+        while posting:
+            offset, posting = POSTING.unpack_from(self._postings_map, posting)
+            offsets.append(offset)
+
+        return offsets[::-1]
+
+    def get_game(self, offset):
+        """
+        Return game on offset as tuple (start position in binary form,
+        list of moves, result).
+        """
+        if offset >= self._games_size:
+            self._map_games()
+        count, result = RECORD_HEADER.unpack_from(self._games_map, offset)
+        position = offset + RECORD_HEADER.size
+        start = self._games_map[position:position + BINARY_SIZE]
+        position += BINARY_SIZE
+        moves = [transposition.decode_move(value) for value, in
+                 MOVE.iter_unpack(
+                     self._games_map[position:position + count * MOVE.size])]
+
+        return (start, moves, RESULTS[result])
+
+    def get_size(self):
+        """
+        Return number of indexed positions.
+        """
+        return self._used
+
+
+def prepare_parser():
+    """
+    Prepare parser for argument parsing.
+    """
+    parser = argparse.ArgumentParser(
+        description='Find games reaching position in game database. ' +
+        'Database is created by pgn.py --database.')
+    parser.add_argument('database', help='Path of database without suffix.')
+    parser.add_argument(
+        '-s',
+        metavar='FEN',
+        default='',
+        help='Position in FEN. Default is start position.')
+
+    return parser
+
+
+def main():
+    """
+    Main function.
+    """
+    args = prepare_parser().parse_args()
+    board = Board.from_fen(args.s) if args.s else Board('')
+    with GameDatabase(args.database) as database:
+        offsets = database.find_games(board.get_hash())
+        results = dict.fromkeys(RESULTS, 0)
+        for offset in offsets:
+            results[database.get_game(offset)[2]] += 1
+    print('Games: ' + str(len(offsets)))
+    for result in RESULTS[1:] + RESULTS[:1]:
+        print(result + ': ' + str(results[result]))
+
+
+if __name__ == "__main__":
+    main()
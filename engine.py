@@ -0,0 +1,384 @@
+"""
+Chess engine module.
+Searches the best move of player on move by negamax alpha-beta search
+with iterative deepening. Every iteration searches one half-move deeper
+and when time runs out the best move of the last finished iteration is
+returned. Moves are ordered by chess.search.MoveOrdering.
+Leaf positions are resolved by quiescence search of captures, captures
+losing material by static exchange evaluation aren't searched.
+Positions in endgame tablebase aren't searched, their score is taken
+from the table.
+Search can run in more processes (Lazy SMP). Every process searches the same
+root with staggered depths and all of them share transposition table in
+shared memory, so they use results of each other.
+"""
+import logging
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+import time
+from chess.search import (
+    TranspositionTable, MoveOrdering, evaluate, see, transposition)
+import tablebase as endgame
+
+INFINITY = 1000000
+MATE = 100000
+MAX_DEPTH = 64
+DEFAULT_DEPTH = 3
+# Number of nodes between checks of time
+TIME_CHECK_NODES = 64
+# Time to wait for results of helper processes in seconds
+HELPER_TIMEOUT = 5
+
+
+class SearchTimeout(Exception):
+    """
+    Raised when time for search is over.
+    """
+
+
+def _score_to_table(score, ply):
+    """
+    Convert mate score relative to current node before storing it.
+    """
+    if score > MATE - MAX_DEPTH:
+        return score + ply
+    if score < -MATE + MAX_DEPTH:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    """
+    Convert mate score stored in table to distance from root.
+    """
+    if score > MATE - MAX_DEPTH:
+        return score - ply
+    if score < -MATE + MAX_DEPTH:
+        return score + ply
+    return score
+
+
+def _search_helper(board, memory_name, age, depth, start_depth, stop_event,
+                   results, tablebase=None):
+    """
+    Search in helper process of parallel search.
+    Result of search is put to results queue.
+    """
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        table = TranspositionTable(buffer=memory.buf)
+        table.set_age(age)
+        helper = Engine(board, table, stop_event, tablebase)
+        results.put(helper._iterate(depth, start_depth))
+    finally:
+        memory.close()
+
+
+class Engine:
+    """
+    Search of the best move on board.
+    """
+
+    def __init__(self, board, table=None, stop_event=None, tablebase=None):
+        self._board = board
+        if table is None:
+            table = TranspositionTable()
+        self._table = table
+        self._ordering = MoveOrdering(board)
+        self._nodes = 0
+        self._deadline = None
+        # Deadline isn't checked until the first iteration finishes
+        self._check_time = False
+        # Event stopping the search from other process
+        self._stop_event = stop_event
+        self._tablebase = tablebase
+        # Hashes of positions on current search path
+        self._path = []
+
+    def search(self, depth=None, time_ms=None, threads=1):
+        """
+        Search the best move of player on move.
+        Search ends after depth half-moves or after time_ms milliseconds,
+        if nothing is specified default depth is used. Search in depth 1
+        always finishes. With more threads search runs in more processes.
+        Returns tuple (move, score, depth). Move is None if player
+        doesn't have any legal move.
+        """
+        if depth is None:
+            depth = MAX_DEPTH if time_ms else DEFAULT_DEPTH
+        self._deadline = None
+        if time_ms:
+            self._deadline = time.perf_counter() + time_ms / 1000
+        self._table.new_search()
+        if threads > 1:
+            return self._search_parallel(depth, threads)
+
+        return self._iterate(depth)
+
+    def _search_parallel(self, depth, threads):
+        """
+        Search in the current process and threads - 1 helper processes
+        sharing transposition table.
+        Returns the deepest result found.
+        """
+        buffer = self._table.get_buffer()
+        memory = shared_memory.SharedMemory(create=True, size=len(buffer))
+        context = multiprocessing.get_context()
+        stop_event = context.Event()
+        results = context.Queue()
+        table = self._table
+        try:
+            memory.buf[:len(buffer)] = buffer
+            self._table = TranspositionTable(buffer=memory.buf)
+            self._table.set_age(table.get_age())
+            helpers = []
+            for index in range(1, threads):
+                # Every second helper starts one half-move deeper
+                helper = context.Process(
+                    target=_search_helper,
+                    args=(self._board, memory.name, table.get_age(), depth,
+                          1 + index % 2, stop_event, results,
+                          self._tablebase),
+                    daemon=True)
+                helper.start()
+                helpers.append(helper)
+
+            result = self._iterate(depth)
+            stop_event.set()
+            for helper in helpers:
+                try:
+                    helper_result = results.get(timeout=HELPER_TIMEOUT)
+                except queue.Empty:
+                    logging.error("Helper process didn't return result")
+                    continue
+                if helper_result[0] is not None and helper_result[2] > result[2]:
+                    result = helper_result
+            for helper in helpers:
+                helper.join(HELPER_TIMEOUT)
+                # Stuck helper doesn't block the search
+                if helper.is_alive():
+                    logging.error("Helper process terminated")
+                    helper.terminate()
+                    helper.join()
+            buffer[:] = memory.buf[:len(buffer)]
+        finally:
+            self._table = table
+            memory.close()
+            memory.unlink()
+
+        return result
+
+    def _iterate(self, depth, start_depth=1):
+        """
+        Search with iterative deepening from start_depth to depth.
+        Returns tuple (move, score, depth).
+        """
+        start_time = time.perf_counter()
+        self._nodes = 0
+        self._ordering.new_search()
+
+        result = (None, 0, 0)
+        for current_depth in range(start_depth, depth + 1):
+            self._path = []
+            # The first iteration always finishes, so there is a move
+            self._check_time = current_depth > start_depth
+            try:
+                move, score = self._search_root(current_depth, result[0])
+            except SearchTimeout:
+                logging.info("Search stopped in depth %s", current_depth)
+                break
+            result = (move, score, current_depth)
+            logging.info("Depth %s: score %s nodes %s", current_depth,
+                         score, self._nodes)
+            # No move or forced mate found
+            if move is None or abs(score) > MATE - MAX_DEPTH:
+                break
+            # Next iteration would not finish in time
+            if (self._deadline and self._stop_event is None and
+                    time.perf_counter() - start_time >
+                    (self._deadline - start_time) / 2):
+                break
+
+        return result
+
+    def _search_root(self, depth, best_move):
+        """
+        Search all moves of player on move in specified depth.
+        Move found in previous iteration is searched first.
+        Returns tuple (move, score).
+        """
+        board = self._board
+        player = board.get_player()
+        moves = self._ordering.order_moves(board.generate_moves(player),
+                                           best_move)
+
+        alpha = -INFINITY
+        best_move = None
+        self._path.append(board.get_hash())
+        for move in moves:
+            board.make_move(move)
+            try:
+                if board.is_check(player):
+                    continue
+                score = -self._negamax(depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                board.unmake_move()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        self._path.pop()
+
+        if best_move is None:
+            return (None, self._get_final_score(player, 0))
+        self._table.store(board.get_hash(), best_move, transposition.EXACT,
+                          depth, alpha)
+        return (best_move, alpha)
+
+    def _negamax(self, depth, alpha, beta, ply):
+        """
+        Alpha-beta search of position.
+        Returns score from the view of player on move.
+        """
+        board = self._board
+        self._nodes += 1
+        if not self._nodes % TIME_CHECK_NODES:
+            self._check_stop()
+
+        key = board.get_hash()
+        # Repetition of position on path is draw
+        if key in self._path:
+            return 0
+
+        # Endgame with known distance to mate
+        if self._tablebase is not None:
+            entry = self._tablebase.probe(board)
+            if entry:
+                result, plies = entry
+                if result == endgame.WIN:
+                    return MATE - ply - plies
+                if result == endgame.LOSS:
+                    return -MATE + ply + plies
+                return 0
+
+        table_move = None
+        entry = self._table.probe(key)
+        if entry:
+            table_move, bound, entry_depth, score = entry
+            if entry_depth >= depth:
+                score = _score_from_table(score, ply)
+                if (bound == transposition.EXACT or
+                        (bound == transposition.LOWER and score >= beta) or
+                        (bound == transposition.UPPER and score <= alpha)):
+                    return score
+
+        if depth <= 0:
+            return self._quiescence(alpha, beta, ply)
+
+        player = board.get_player()
+        moves = self._ordering.order_moves(
+            board.generate_moves(player), table_move, ply)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        self._path.append(key)
+        for move in moves:
+            capture = self._ordering.is_capture(move)
+            board.make_move(move)
+            try:
+                if board.is_check(player):
+                    continue
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not capture and len(move) == 2:
+                            self._ordering.add_cutoff(move, depth, ply)
+                        break
+        self._path.pop()
+
+        if best_move is None:
+            return self._get_final_score(player, ply)
+
+        if best_score >= beta:
+            bound = transposition.LOWER
+        elif best_score > original_alpha:
+            bound = transposition.EXACT
+        else:
+            bound = transposition.UPPER
+        self._table.store(key, best_move, bound, depth,
+                          _score_to_table(best_score, ply))
+        return best_score
+
+    def _quiescence(self, alpha, beta, ply):
+        """
+        Search only captures and promotions until position is quiet.
+        Player can also keep the static evaluation (stand pat), player in
+        check searches all evasions instead and is mated without them.
+        Returns score from the view of player on move.
+        """
+        board = self._board
+        self._nodes += 1
+        if not self._nodes % TIME_CHECK_NODES:
+            self._check_stop()
+
+        if ply >= MAX_DEPTH:
+            return evaluate(board)
+        player = board.get_player()
+        in_check = board.is_check(player)
+        if in_check:
+            best_score = -MATE + ply
+            moves = board.generate_moves(player)
+        else:
+            best_score = evaluate(board)
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            moves = [move for move in board.generate_moves(player)
+                     if len(move) > 2 or self._ordering.is_capture(move)]
+
+        for move in self._ordering.order_moves(moves):
+            # Losing capture
+            if not in_check and see(board, move) < 0:
+                continue
+            board.make_move(move)
+            try:
+                if board.is_check(player):
+                    continue
+                score = -self._quiescence(-beta, -alpha, ply + 1)
+            finally:
+                board.unmake_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        return best_score
+
+    def _check_stop(self):
+        """
+        Stop the search if time is over or other process requested it.
+        """
+        if (self._check_time and self._deadline and
+                time.perf_counter() > self._deadline):
+            raise SearchTimeout()
+        if self._stop_event is not None and self._stop_event.is_set():
+            raise SearchTimeout()
+
+    def _get_final_score(self, player, ply):
+        """
+        Return score of position without legal move.
+        Player in check is mated, otherwise it's a draw.
+        """
+        if self._board.is_check(player):
+            return -MATE + ply
+        return 0
@@ -2,9 +2,19 @@
 Chess game logic module.
 """
 import logging
+import re
 from enum import Enum
 from chess import figures
+from chess import trace
 from chess.board import Board
+from chess.board.board import FIGURE_MARKS
+import book
+import database
+import engine
+import tablebase
+
+# Move in format FROM-TO (A1-B1)
+MOVE_PATTERN = re.compile("^[a-hA-H][1-8]-[a-hA-H][1-8]$")
 
 
 class Conditions(Enum):
@@ -17,28 +27,48 @@ class Conditions(Enum):
     play = 3
 
 
+def get_coordinates(position):
+    """
+    Get coordinates in range 0-7 from position text (A1).
+    """
+    return (ord(position[0].lower()) - 97, int(position[1]) - 1)
+
+
 class ChessLogic:
     """
     Game logic for chess game.
     """
 
     def __init__(self, state):
-        self._board = Board(state)
-        self._current_player = figures.figure.WHITE
+        # State in binary form
+        if isinstance(state, bytes):
+            self._board = Board.from_bytes(state)
+        # State in FEN
+        elif isinstance(state, str) and state:
+            self._board = Board.from_fen(state)
+        else:
+            self._board = Board(state)
+        self._engine = None
+        self._database = None
+        self._book = None
+        self._tablebase = None
 
     def get_moves(self, figure):
         """
         Returns all moves for selected figure.
         """
 
-        logging.info("Generating moves for %s on %s:%s", figure.get_type(),
-                     figure.get_position()[0], figure.get_position()[1])
-        moves = figure.generate_moves(8, 8)
+        if trace.ENABLED:
+            trace.log("Generating moves for %s on %s:%s", figure.get_type(),
+                      figure.get_position()[0], figure.get_position()[1])
+        moves = figure.generate_moves()
         return moves
 
-    def move_figure(self, start, target):
+    def move_figure(self, start, target, promotion=None):
         """
         Move with figure from start to target position.
+        Promotion is type of figure pawn is promoted to (queen by default).
+        Returns True if figure was moved.
         """
         figure = self._board.get_figure(start[0], start[1])
         # Check if figure is on the start position
@@ -47,101 +77,85 @@ class ChessLogic:
                 "No figure on specified position %s:%s",
                 start[0],
                 start[1])
-            return
+            return False
         # Check if figure is owned by current player
-        if figure.get_owner() != self._current_player:
+        player = self._board.get_player()
+        if figure.get_owner() != player:
             logging.error("Can't move with oponent figure")
-            return
-
-        if figure.move_to(target[0], target[1], 8, 8):
-            # Castling
-            if figure.get_type() == figures.figure.KING and figure.isCastling():
-                pos = figure.get_position()
-                # Check if king moved left or right
-                if pos[0] > 4:
-                    rook = self._board.get_figure(7, pos[1])
-                    rook.move_to(
-                        target[0] - 1,
-                        pos[1],
-                        8,
-                        8,
-                        False)
-                    logging.info(
-                        "Move rook figure on %s:%s after castling", 7, pos[1])
-                else:
-                    rook = self._board.get_figure(0, pos[1])
-                    rook.move_to(
-                        target[0] + 1,
-                        pos[1],
-                        8,
-                        8,
-                        False)
-                    logging.info(
-                        "Move rook figure on %s:%s after castling", 0, pos[1])
-
-    def get_state(self):
+            return False
+
+        if not figure.move_to(target[0], target[1], promotion=promotion):
+            return False
+
+        # Player can't leave his king in check
+        if self._board.is_check(player):
+            logging.error("King can't be left in check")
+            self._board.unmake_move()
+            return False
+
+        return True
+
+    def get_state(self, binary=False):
         """
         Get current state of game.
+        If binary is True, state is returned in compact binary form
+        (see Board.to_bytes) including player on move.
         """
-        state = []
-        # Loop through whole game board
-        # If figure is found in position, then print figure
-        # else print empty space
-        logging.info("Return chess game board state.")
-        for y_index in range(0, 8):
-            for x_index in range(0, 8):
-                fig = self._board.get_figure(x_index, y_index)
-                if fig:
-                    logging.debug(
+        if binary:
+            return self._board.to_bytes()
+        # Every position without figure is empty space
+        state = [''] * 64
+        if trace.ENABLED:
+            trace.log("Return chess game board state.")
+        for color in [figures.figure.WHITE, figures.figure.BLACK]:
+            for fig in self._board.get_figures(color):
+                x_index, y_index = fig.get_position()
+                if trace.ENABLED:
+                    trace.log(
                         "Figure found on %s:%s with color %s",
                         x_index,
                         y_index,
-                        fig.get_owner())
-                    state.append(self._get_figure_mark(fig))
-                else:
-                    state.append('')
+                        color)
+                state[y_index * 8 + x_index] = self._get_figure_mark(fig)
 
         return state
 
+    def get_fen(self):
+        """
+        Get current state of game in FEN.
+        """
+        return self._board.to_fen()
+
     def _get_figure_mark(self, figure):
         """
         Return mark that will be print in application output.
         """
-        mark = ''
-        if figure.get_owner() == figures.figure.BLACK:
-            mark += 'b'
-        else:
-            mark += 'w'
-
-        fig_type = figure.get_type()
-
-        if fig_type == figures.figure.PAWN:
-            mark += 'p'
-        elif fig_type == figures.figure.KNIGHT:
-            mark += 'kn'
-        elif fig_type == figures.figure.ROOK:
-            mark += 'r'
-        elif fig_type == figures.figure.BISHOP:
-            mark += 'b'
-        elif fig_type == figures.figure.QUEEN:
-            mark += 'q'
-        elif fig_type == figures.figure.KING:
-            mark += 'ki'
-
-        return mark
+        return FIGURE_MARKS[figure.get_owner()][figure.get_type()]
 
     def get_condition(self):
         """
         Check if current player is in check.
         """
-        king = self._board.get_king(self._current_player)
-        if king:
-            if king.isCheck(8, 8):
-                # Check mate
-                if self.get_moves(king):
-                    return Conditions.check
-                else:
-                    return Conditions.checkMate
+        # Won or lost position in tablebase has legal move until mate
+        entry = self.probe_tablebase()
+        if entry and entry[0] != tablebase.DRAW:
+            if not entry[1]:
+                return Conditions.checkMate
+            has_move = True
+        else:
+            # Player without legal move is mated or it is a draw
+            has_move = False
+            for move in self._board.generate_moves(self._board.get_player()):
+                if self.is_legal(move):
+                    has_move = True
+                    break
+
+        if self._board.is_check(self._board.get_player()):
+            if has_move:
+                return Conditions.check
+            return Conditions.checkMate
+        if not has_move:
+            return Conditions.draw
         return Conditions.play
 
     def set_player(self, player):
@@ -149,10 +163,151 @@ class ChessLogic:
         Return current player.
         """
         if player.lower() == 'black' or player.lower() == 'b':
-            self._current_player = figures.figure.BLACK
-        elif player.lower == 'white' or player.lower() == 'w':
-            self._current_player = figures.figure.WHITE
-        logging.debug("Player %s is on move", self._current_player)
+            self._board.set_player(figures.figure.BLACK)
+        elif player.lower() == 'white' or player.lower() == 'w':
+            self._board.set_player(figures.figure.WHITE)
+        if trace.ENABLED:
+            trace.log("Player %s is on move", self._board.get_player())
+
+    def get_board(self):
+        """
+        Return board of game.
+        """
+        return self._board
+
+    def get_player(self):
+        """
+        Return player on move.
+        """
+        return self._board.get_player()
+
+    def get_hash(self):
+        """
+        Return zobrist hash of current position.
+        """
+        return self._board.get_hash()
+
+    def best_move(self, depth=None, time_ms=None, threads=1):
+        """
+        Search the best move of current player.
+        Search ends after depth half-moves or after time_ms milliseconds.
+        Threads is number of processes running the search.
+        Returns (start, target) or (start, target, promotion), None if
+        player doesn't have any legal move.
+        Move from opening book is returned without search if book is opened.
+        """
+        if self._book is not None:
+            move = self._book.choose_move(self._board)
+            if move:
+                logging.info("Book move %s", move)
+                return move
+        if self._engine is None:
+            self._engine = engine.Engine(self._board,
+                                         tablebase=self._tablebase)
+        move, score, searched_depth = self._engine.search(
+            depth, time_ms, threads)
+        logging.info("Best move %s with score %s in depth %s", move, score,
+                     searched_depth)
+        return move
+
+    def open_book(self, path):
+        """
+        Open Polyglot opening book used by best_move.
+        """
+        if self._book is not None:
+            self._book.close()
+        self._book = book.OpeningBook(path)
+
+    def get_book_moves(self):
+        """
+        Return legal moves of current position in opened book as list
+        of (move, weight) sorted by weight.
+        """
+        if self._book is None:
+            return []
+        return self._book.get_moves(self._board)
+
+    def open_tablebase(self, directory):
+        """
+        Open endgame tablebase used by get_condition and best_move.
+        """
+        if self._tablebase is not None:
+            self._tablebase.close()
+        self._tablebase = tablebase.Tablebase(directory)
+        self._engine = None
+
+    def probe_tablebase(self):
+        """
+        Return (result, plies) of current position in opened tablebase,
+        result is tablebase.WIN, DRAW or LOSS for current player and plies
+        is number of half-moves to mate.
+        Returns None if the position isn't in tablebase.
+        """
+        if self._tablebase is None:
+            return None
+        return self._tablebase.probe(self._board)
+
+    def open_database(self, path, writable=False):
+        """
+        Open game database used by find_games.
+        Returns opened database.
+        """
+        if self._database is not None:
+            self._database.close()
+        self._database = database.GameDatabase(path, writable)
+        return self._database
+
+    def find_games(self):
+        """
+        Find games in opened database which reached current position.
+        Returns list of (start position in binary form, moves, result).
+        """
+        if self._database is None:
+            raise ValueError("Game database isn't opened")
+        return [self._database.get_game(offset) for offset in
+                self._database.find_games(self._board.get_hash())]
+
+    def perft(self, depth):
+        """
+        Count leaf nodes reachable from current state in specified depth.
+        """
+        if depth == 0:
+            return 1
+
+        nodes = 0
+        player = self._board.get_player()
+        for move in self._board.generate_moves(player):
+            self._board.make_move(move)
+            if not self._board.is_check(player):
+                nodes += self.perft(depth - 1)
+            self._board.unmake_move()
+
+        return nodes
+
+    def divide(self, depth):
+        """
+        Count leaf nodes reachable after every move of current player.
+        Returns list of (move, nodes).
+        """
+        result = []
+        player = self._board.get_player()
+        for move in self._board.generate_moves(player):
+            self._board.make_move(move)
+            if not self._board.is_check(player):
+                result.append((move, self.perft(depth - 1)))
+            self._board.unmake_move()
+
+        return result
+
+    def is_legal(self, move):
+        """
+        Check if move doesn't leave king of current player in check.
+        """
+        player = self._board.get_player()
+        self._board.make_move(move)
+        legal = not self._board.is_check(player)
+        self._board.unmake_move()
+        return legal
 
 # Test section
 # if __name__ == "__main__":
@@ -0,0 +1,99 @@
+"""
+Perft (performance test) for chess move generation.
+It counts leaf nodes of the game tree and compares them with reference numbers.
+Perft can be split by moves of player on turn to more processes, every
+process rebuilds the game from FEN and counts nodes after its move.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+import logic
+
+
+# Reference positions (name, FEN, leaf nodes for depth 1..N)
+REFERENCE_POSITIONS = [
+    ('Start position',
+     'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     [20, 400, 8902, 197281]),
+    ('Kiwipete',
+     'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862]),
+    ('Position 3',
+     '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238]),
+    ('Position 4',
+     'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467]),
+    ('Position 5',
+     'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379]),
+    ('Castling',
+     'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1',
+     [26, 568, 13744]),
+]
+
+
+def _perft_move(fen, move, depth):
+    """
+    Count leaf nodes after move in new game created from FEN.
+    Used by processes of parallel perft.
+    """
+    game_logic = logic.ChessLogic(fen)
+    # Move is applied by board like in serial divide
+    game_logic.get_board().make_move(move)
+
+    return game_logic.perft(depth - 1)
+
+
+def _divide_parallel(game_logic, depth, jobs):
+    """
+    Count leaf nodes after every move of player on turn in jobs processes.
+    Returns list of (move, nodes).
+    """
+    moves = [move for move, _ in game_logic.divide(1)]
+    if depth == 1:
+        return [(move, 1) for move in moves]
+
+    fen = game_logic.get_fen()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_perft_move, fen, move, depth)
+                   for move in moves]
+        return [(move, future.result())
+                for move, future in zip(moves, futures)]
+
+
+def run_perft(game_logic, depth, divide=False, jobs=1):
+    """
+    Run perft on game from current state.
+    If jobs is more than 1, perft is split by moves to jobs processes.
+    Returns tuple (nodes, elapsed seconds, divide results).
+    """
+    start_time = time.perf_counter()
+    results = []
+    if jobs > 1:
+        results = _divide_parallel(game_logic, depth, jobs)
+        nodes = sum(result[1] for result in results)
+        if not divide:
+            results = []
+    elif divide:
+        results = game_logic.divide(depth)
+        nodes = sum(result[1] for result in results)
+    else:
+        nodes = game_logic.perft(depth)
+    elapsed = time.perf_counter() - start_time
+
+    return (nodes, elapsed, results)
+
+
+def run_suite(max_depth, jobs=1):
+    """
+    Run perft on all reference positions up to max_depth.
+    Returns list of (name, depth, expected nodes, nodes, elapsed seconds).
+    """
+    results = []
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for depth in range(1, min(max_depth, len(expected)) + 1):
+            game_logic = logic.ChessLogic(fen)
+            nodes, elapsed, _ = run_perft(game_logic, depth, jobs=jobs)
+            results.append((name, depth, expected[depth - 1], nodes, elapsed))
+
+    return results
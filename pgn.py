@@ -0,0 +1,270 @@
+"""
+PGN reader.
+Games are read one by one from PGN file (also compressed by gzip), so files
+of any size can be processed. Moves in standard algebraic notation (SAN)
+are replayed through ChessLogic.move_figure. Replayed games can be stored
+to game database (see database.py).
+"""
+#!/bin/python3
+import argparse
+import gzip
+import logging
+import re
+import sys
+import time
+import database
+import logic
+from chess import figures
+
+HEADER_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]$')
+TOKEN_PATTERN = re.compile(r'[{}();]|[^\s{}();]+')
+MOVE_NUMBER_PATTERN = re.compile(r'^\d+\.+')
+SAN_PATTERN = re.compile(
+    r'^([NBRQK])?([a-h])?([1-8])?x?([a-h])([1-8])(?:=?([NBRQ]))?$')
+RESULTS = ['1-0', '0-1', '1/2-1/2', '*']
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Figure type indexed by SAN letter
+SAN_FIGURES = {
+    'N': figures.figure.KNIGHT,
+    'B': figures.figure.BISHOP,
+    'R': figures.figure.ROOK,
+    'Q': figures.figure.QUEEN,
+    'K': figures.figure.KING}
+
+
+def open_pgn(path):
+    """
+    Open PGN file for reading as text, gzip file is decompressed.
+    """
+    with open(path, 'rb') as pgn_file:
+        compressed = pgn_file.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8-sig', errors='replace')
+    return open(path, 'r', encoding='utf-8-sig', errors='replace')
+
+
+def read_games(stream):
+    """
+    Read games from stream of PGN lines.
+    Yields tuples (headers, moves, result), headers is dictionary
+    and moves is list of moves in SAN. Comments, variations and numeric
+    annotations are skipped.
+    """
+    headers = {}
+    moves = []
+    result = None
+    comment = False
+    variation = 0
+    for line in stream:
+        # Escaped line
+        if line.startswith('%'):
+            continue
+        line = line.strip()
+        if not comment and not variation and line.startswith('['):
+            match = HEADER_PATTERN.match(line)
+            if match:
+                # Headers of next game
+                if moves or result:
+                    yield (headers, moves, result or '*')
+                    headers, moves, result = {}, [], None
+                headers[match.group(1)] = match.group(2)
+                continue
+
+        for token in TOKEN_PATTERN.findall(line):
+            if comment:
+                comment = token != '}'
+            elif token == '{':
+                comment = True
+            elif token == ';':
+                break
+            elif token == '(':
+                variation += 1
+            elif token == ')':
+                variation = max(0, variation - 1)
+            elif variation or token.startswith('$') or token == 'e.p.':
+                continue
+            elif token in RESULTS:
+                yield (headers, moves, token)
+                headers, moves, result = {}, [], None
+            else:
+                token = MOVE_NUMBER_PATTERN.sub('', token)
+                if token:
+                    moves.append(token)
+
+    if headers or moves:
+        yield (headers, moves, result or '*')
+
+
+def find_move(game_logic, san):
+    """
+    Find move of player on move described in SAN.
+    Returns (start, target) or (start, target, promotion).
+    Raises ValueError if there isn't exactly one legal move.
+    """
+    board = game_logic.get_board()
+    player = game_logic.get_player()
+    san = san.rstrip('+#!?')
+    # Castling
+    if san in ['O-O', 'O-O-O', '0-0', '0-0-0']:
+        king = board.get_king(player)
+        if king is None:
+            raise ValueError("Castling without king {}".format(san))
+        x_index, y_index = king.get_position()
+        step = 2 if len(san) == 3 else -2
+        move = ((x_index, y_index), (x_index + step, y_index))
+        if ((x_index + step, y_index, figures.figure.KING) not in
+                king.generate_moves() or not game_logic.is_legal(move)):
+            raise ValueError("Move {} is illegal".format(san))
+        return move
+
+    match = SAN_PATTERN.match(san)
+    if not match:
+        raise ValueError("Invalid SAN {}".format(san))
+    letter, from_file, from_rank, to_file, to_rank, promotion = match.groups()
+    figure_type = SAN_FIGURES.get(letter, figures.figure.PAWN)
+    target = (ord(to_file) - 97, int(to_rank) - 1)
+    if promotion:
+        # Only pawn on the last rank is promoted
+        if figure_type != figures.figure.PAWN or target[1] not in (0, 7):
+            raise ValueError("Invalid promotion {}".format(san))
+        promotion = SAN_FIGURES[promotion]
+
+    candidates = []
+    # Legality test moves figures in the list, so copy is iterated
+    for fig in list(board.get_figures(player)):
+        if fig.get_type() != figure_type:
+            continue
+        start = fig.get_position()
+        if ((from_file and start[0] != ord(from_file) - 97) or
+                (from_rank and start[1] != int(from_rank) - 1)):
+            continue
+        for x_index, y_index, type_after in fig.generate_moves():
+            if (x_index, y_index) != target:
+                continue
+            if type_after != figure_type:
+                if type_after != (promotion or figures.figure.QUEEN):
+                    continue
+                move = (start, target, type_after)
+            else:
+                move = (start, target)
+            if game_logic.is_legal(move):
+                candidates.append(move)
+
+    if len(candidates) != 1:
+        raise ValueError("Move {} is {}".format(
+            san, 'ambiguous' if candidates else 'illegal'))
+    return candidates[0]
+
+
+def replay_game(headers, moves):
+    """
+    Replay moves of game from start position or from FEN header.
+    Yields (san, move, game logic) after every move.
+    Raises ValueError if move can't be played.
+    """
+    game_logic = logic.ChessLogic(headers.get('FEN', ''))
+    for san in moves:
+        move = find_move(game_logic, san)
+        if not game_logic.move_figure(*move):
+            raise ValueError("Move {} can't be played".format(san))
+        yield (san, move, game_logic)
+
+
+def replay_games(stream, game_database=None):
+    """
+    Replay all games from stream of PGN lines.
+    Yields tuples (headers, result, number of played half-moves, error)
+    where error is None if the whole game was replayed.
+    Whole replayed games are added to game database if it's specified.
+    """
+    for headers, moves, result in read_games(stream):
+        plies = 0
+        error = None
+        played = []
+        try:
+            if game_database is not None:
+                start = logic.ChessLogic(
+                    headers.get('FEN', '')).get_state(binary=True)
+            for _, move, _ in replay_game(headers, moves):
+                played.append(move)
+                plies += 1
+        except ValueError as exception:
+            error = "{} (half-move {})".format(exception, plies + 1)
+            logging.error("Game %s: %s", headers.get('Event', '?'), error)
+        if game_database is not None and error is None:
+            game_database.add_game(start, played, result)
+        yield (headers, result, plies, error)
+
+
+def prepare_parser():
+    """
+    Prepare parser for argument parsing.
+    """
+    parser = argparse.ArgumentParser(
+        description='Replay games from PGN files.')
+    parser.add_argument(
+        'files',
+        nargs='+',
+        help='PGN files, file compressed by gzip is detected.')
+    parser.add_argument(
+        '-v',
+        action='store_true',
+        help='Print result of every game.')
+    parser.add_argument(
+        '--database',
+        metavar='path',
+        help='Add replayed games to game database, it\'s created if it ' +
+        'doesn\'t exist.')
+
+    return parser
+
+
+def main():
+    """
+    Main function.
+    """
+    logging.basicConfig(
+        format='[%(asctime)s] ' +
+        '{%(pathname)s:%(lineno)d} %(levelname)s - %(message)s',
+        level=logging.ERROR)
+    args = prepare_parser().parse_args()
+
+    games = 0
+    plies = 0
+    errors = 0
+    results = dict.fromkeys(RESULTS, 0)
+    game_database = None
+    if args.database:
+        game_database = database.GameDatabase(args.database, writable=True)
+    start_time = time.perf_counter()
+    for path in args.files:
+        with open_pgn(path) as stream:
+            for headers, result, game_plies, error in replay_games(
+                    stream, game_database):
+                games += 1
+                plies += game_plies
+                results[result] = results.get(result, 0) + 1
+                if error:
+                    errors += 1
+                if args.v:
+                    print('{} - {}: {} {} half-moves{}'.format(
+                        headers.get('White', '?'), headers.get('Black', '?'),
+                        result, game_plies,
+                        ' ERROR ' + error if error else ''))
+    elapsed = time.perf_counter() - start_time
+    if game_database is not None:
+        game_database.close()
+
+    print('Games: ' + str(games))
+    print('Half-moves: ' + str(plies))
+    print('Errors: ' + str(errors))
+    for result in RESULTS:
+        print(result + ': ' + str(results[result]))
+    print('Time: {:.3f}s'.format(elapsed))
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
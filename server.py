@@ -0,0 +1,241 @@
+"""
+Chess game server.
+Keeps games in memory between moves and accepts requests on TCP or UNIX
+socket. Every request and response is one line with JSON object.
+
+Requests:
+{"command": "new", "game": id, "state": state or FEN, "player": player}
+{"command": "move", "game": id, "move": "E2-E4", "promotion": "queen"}
+{"command": "state", "game": id}
+{"command": "condition", "game": id}
+{"command": "close", "game": id}
+State and player of new game are optional, new game is the start position
+with white on move.
+"""
+#!/bin/python3
+import argparse
+import asyncio
+import json
+import logging
+import logic
+import sessions
+from chess.board.board import MARK_FIGURES
+from chess.figures.pawn import PROMOTIONS
+from chess import trace
+
+
+class GameServer:
+    """
+    Server keeping games in session store indexed by game id.
+    """
+
+    def __init__(self, store=None):
+        if store is None:
+            store = sessions.SessionStore()
+        self._games = store
+
+    def process_request(self, request):
+        """
+        Process one request and return response dictionary.
+        Raises ValueError if request is invalid.
+        """
+        if not isinstance(request, dict):
+            raise ValueError("Request must be JSON object")
+        command = request.get('command')
+        game_id = request.get('game')
+        # Bool is int in JSON decoder, but isn't valid game id
+        if (isinstance(game_id, bool) or
+                not isinstance(game_id, (str, int))):
+            raise ValueError("Invalid game id {}".format(game_id))
+
+        if command == 'new':
+            return self._new_game(game_id, request)
+        if command == 'close':
+            if not self._games.remove(game_id):
+                raise ValueError("Unknown game {}".format(game_id))
+            return {'game': game_id, 'closed': True}
+        game_logic = self._games.get(game_id)
+        if game_logic is None:
+            raise ValueError("Unknown game {}".format(game_id))
+        if command == 'move':
+            return self._move(game_id, game_logic, request)
+        if command == 'state':
+            return self._get_state(game_id, game_logic)
+        if command == 'condition':
+            return {'game': game_id,
+                    'condition': game_logic.get_condition().name}
+
+        raise ValueError("Unknown command {}".format(command))
+
+    def _new_game(self, game_id, request):
+        """
+        Create new game from state in request.
+        """
+        state = request.get('state') or ''
+        # State is list of figure marks or FEN
+        if state and not (isinstance(state, str) or
+                          (isinstance(state, list) and len(state) == 64 and
+                           all(isinstance(mark, str) and
+                               (not mark or mark in MARK_FIGURES)
+                               for mark in state))):
+            raise ValueError("Invalid state format")
+        game_logic = logic.ChessLogic(state)
+        player = request.get('player')
+        if player:
+            if not isinstance(player, str):
+                raise ValueError("Invalid player {}".format(player))
+            game_logic.set_player(player)
+        self._games.put(game_id, game_logic)
+        logging.info("New game %s", game_id)
+
+        return self._get_state(game_id, game_logic)
+
+    def _move(self, game_id, game_logic, request):
+        """
+        Move figure in game.
+        """
+        move = request.get('move')
+        if not isinstance(move, str) or not logic.MOVE_PATTERN.match(move):
+            raise ValueError("Invalid move format {}".format(move))
+        promotion = request.get('promotion')
+        if promotion is not None and promotion not in PROMOTIONS:
+            raise ValueError("Invalid promotion {}".format(promotion))
+        start, target = move.split('-')
+        moved = game_logic.move_figure(
+            logic.get_coordinates(start), logic.get_coordinates(target), promotion)
+
+        response = self._get_state(game_id, game_logic)
+        response['moved'] = moved
+        return response
+
+    def _get_state(self, game_id, game_logic):
+        """
+        Return state of game and player on move.
+        """
+        return {'game': game_id, 'state': game_logic.get_state(),
+                'player': game_logic.get_player()}
+
+    async def handle_client(self, reader, writer):
+        """
+        Process requests of one client until connection is closed.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors='replace').strip()
+                if not line:
+                    continue
+                try:
+                    response = self.process_request(json.loads(line))
+                except ValueError as error:
+                    logging.error("Invalid request %s: %s", line, error)
+                    response = {'error': str(error)}
+                # Client stays connected after unexpected error
+                except Exception as error:
+                    logging.exception("Request %s failed", line)
+                    response = {'error': str(error)}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        # Line over the limit of reader (ValueError) or lost client
+        except (ValueError, asyncio.LimitOverrunError,
+                ConnectionError) as error:
+            logging.error("Closing connection: %s", error)
+
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def serve(self, host=None, port=None, unix_path=None):
+        """
+        Listen on TCP port and/or UNIX socket until cancelled.
+        """
+        servers = []
+        if port is not None:
+            servers.append(await asyncio.start_server(
+                self.handle_client, host, port))
+            logging.info("Listening on %s:%s", host, port)
+        if unix_path is not None:
+            servers.append(await asyncio.start_unix_server(
+                self.handle_client, unix_path))
+            logging.info("Listening on %s", unix_path)
+
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+def prepare_parser():
+    """
+    Prepare parser for argument parsing.
+    """
+    parser = argparse.ArgumentParser(description='Chess game server.')
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Address of TCP server. Default is 127.0.0.1.')
+    parser.add_argument(
+        '--port',
+        type=int,
+        help='Port of TCP server.')
+    parser.add_argument(
+        '--unix',
+        metavar='path',
+        help='Path of UNIX socket.')
+    parser.add_argument(
+        '--max-games',
+        type=int,
+        default=10000,
+        help='Maximal number of games in memory. Default is 10000.')
+    parser.add_argument(
+        '--max-memory',
+        metavar='MB',
+        type=int,
+        help='Maximal estimated memory of games in MB.')
+    parser.add_argument(
+        '--spill-dir',
+        help='Directory for games evicted from memory. Without it evicted ' +
+        'games are lost.')
+    parser.add_argument(
+        '-ll',
+        choices=[
+            'NOTSET',
+            'DEBUG',
+            'INFO',
+            'WARNING',
+            'ERROR',
+            'CRITICAL'],
+        default='ERROR',
+        help='Change log level. Default is ERROR.')
+
+    return parser
+
+
+def main():
+    """
+    Main function.
+    """
+    parser = prepare_parser()
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='[%(asctime)s] ' +
+        '{%(pathname)s:%(lineno)d} %(levelname)s - %(message)s',
+        level=getattr(logging, args.ll))
+    trace.enable(getattr(logging, args.ll) <= logging.INFO)
+    if args.port is None and args.unix is None:
+        logging.error("Port or UNIX socket must be specified.")
+        parser.print_help()
+        return
+
+    store = sessions.SessionStore(args.max_games, args.max_memory,
+                                  args.spill_dir)
+    server = GameServer(store)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        logging.info("Server stopped")
+
+
+if __name__ == "__main__":
+    main()
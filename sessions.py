@@ -0,0 +1,122 @@
+"""
+Store of live games.
+Games are kept in memory in order of last access. When number of games or
+their estimated memory exceeds the limit, the least recently used game is
+written to spill directory in FEN, which keeps also half-move clock and
+move number, and it's loaded again on next access.
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import logic
+
+# Estimated memory of one game in bytes
+GAME_MEMORY = 10 * 1024
+SPILL_SUFFIX = '.game'
+
+
+def dump_game(game_logic):
+    """
+    Return game in compact form (FEN).
+    """
+    return game_logic.get_fen().encode()
+
+
+def load_game(data):
+    """
+    Create game from compact form returned by dump_game.
+    """
+    return logic.ChessLogic(data.decode())
+
+
+class SessionStore:
+    """
+    Games indexed by game id with least recently used eviction.
+    """
+
+    def __init__(self, max_games=10000, max_memory_mb=None, spill_dir=None):
+        self._games = collections.OrderedDict()
+        self._max_games = max_games
+        if max_memory_mb is not None:
+            self._max_games = min(
+                max_games, max(1, max_memory_mb * 1024 * 1024 // GAME_MEMORY))
+        self._spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._games)
+
+    def get(self, game_id):
+        """
+        Return game with game id or None if there is no such game.
+        Spilled game is loaded back to memory.
+        """
+        game_logic = self._games.get(game_id)
+        if game_logic is not None:
+            self._games.move_to_end(game_id)
+            return game_logic
+
+        path = self._get_path(game_id)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, 'rb') as spill_file:
+            game_logic = load_game(spill_file.read())
+        os.remove(path)
+        logging.debug("Game %s loaded from %s", game_id, path)
+        self._games[game_id] = game_logic
+        self._evict()
+        return game_logic
+
+    def put(self, game_id, game_logic):
+        """
+        Add game with game id to store.
+        """
+        self._games[game_id] = game_logic
+        self._games.move_to_end(game_id)
+        path = self._get_path(game_id)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+        self._evict()
+
+    def remove(self, game_id):
+        """
+        Remove game from store.
+        Returns False if there is no such game.
+        """
+        removed = self._games.pop(game_id, None) is not None
+        path = self._get_path(game_id)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+            removed = True
+        return removed
+
+    def _evict(self):
+        """
+        Move least recently used games from memory over the limit to disk.
+        Without spill directory evicted games are lost.
+        """
+        while len(self._games) > self._max_games:
+            game_id, game_logic = next(iter(self._games.items()))
+            path = self._get_path(game_id)
+            if path is None:
+                logging.warning("Game %s removed from full store", game_id)
+            else:
+                # Game stays in memory if it can't be written
+                with open(path, 'wb') as spill_file:
+                    spill_file.write(dump_game(game_logic))
+                logging.debug("Game %s spilled to %s", game_id, path)
+            del self._games[game_id]
+
+    def _get_path(self, game_id):
+        """
+        Return path of spilled game or None without spill directory.
+        File is named by hash of game id in JSON, so ids 5 and "5" have
+        different paths and long ids don't exceed the limit of file name.
+        """
+        if not self._spill_dir:
+            return None
+        name = hashlib.sha1(json.dumps(game_id).encode()).hexdigest()
+        return os.path.join(self._spill_dir, name + SPILL_SUFFIX)
@@ -0,0 +1,643 @@
+"""
+Endgame tablebases.
+Table of material set (for example KQvK) contains result of every position
+with distance to mate, so endgame position is resolved by one lookup.
+Tables are built by retrograde analysis: positions are finalized in order
+of distance to mate from mates back to positions one half-move farther,
+a position is lost when all its moves lead to positions won by oponent.
+Captures and promotions lead to smaller tables which are built first.
+Castling and en passant aren't part of tables.
+
+Table file is header followed by one byte per position: 0 is draw (or
+invalid position), otherwise number of half-moves to mate + 1. Odd number
+of half-moves is win of player on move, even is loss. Tables with pawns
+are mirrored by files, tables without pawns also by ranks, so white king
+is always on queen side (and on first four ranks without pawns).
+"""
+#!/bin/python3
+import argparse
+import collections
+import logging
+import mmap
+import os
+import time
+from chess import figures
+from chess.board import Board
+
+MAGIC = b'CHESSTB1'
+SUFFIX = '.tb'
+MAX_PIECES = 4
+# Results from the view of player on move
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+# Figure types in order of material string
+FIGURE_LETTERS = {
+    figures.figure.KING: 'K',
+    figures.figure.QUEEN: 'Q',
+    figures.figure.ROOK: 'R',
+    figures.figure.BISHOP: 'B',
+    figures.figure.KNIGHT: 'N',
+    figures.figure.PAWN: 'P'}
+LETTER_FIGURES = {letter: figure_type for figure_type, letter in
+                  FIGURE_LETTERS.items()}
+LETTER_ORDER = 'KQRBNP'
+LETTER_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+PROMOTIONS = (figures.figure.QUEEN, figures.figure.ROOK,
+              figures.figure.BISHOP, figures.figure.KNIGHT)
+# Colors in tables, white is 0
+COLORS = (figures.figure.WHITE, figures.figure.BLACK)
+
+
+def _init_steps(steps):
+    """
+    Return targets of step figure for every square.
+    """
+    targets = []
+    for square in range(64):
+        x_index, y_index = square & 7, square >> 3
+        targets.append(tuple(
+            (y_index + y_step) * 8 + x_index + x_step
+            for x_step, y_step in steps
+            if 0 <= x_index + x_step < 8 and 0 <= y_index + y_step < 8))
+    return tuple(targets)
+
+
+def _init_rays(directions):
+    """
+    Return squares in every direction for every square.
+    """
+    rays = []
+    for square in range(64):
+        square_rays = []
+        for x_step, y_step in directions:
+            x_index, y_index = square & 7, square >> 3
+            ray = []
+            while True:
+                x_index += x_step
+                y_index += y_step
+                if not (0 <= x_index < 8 and 0 <= y_index < 8):
+                    break
+                ray.append(y_index * 8 + x_index)
+            square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+def _init_between(rays):
+    """
+    Return dictionary of squares between square and every square on its
+    rays for every square.
+    """
+    return tuple({target: ray[:index] for ray in square_rays
+                  for index, target in enumerate(ray)}
+                 for square_rays in rays)
+
+
+KING_TARGETS = _init_steps(
+    ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)))
+KNIGHT_TARGETS = _init_steps(
+    ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)))
+# Squares attacked by pawn of color
+PAWN_ATTACKS = (_init_steps(((1, 1), (-1, 1))),
+                _init_steps(((1, -1), (-1, -1))))
+ROOK_RAYS = _init_rays(((1, 0), (0, 1), (-1, 0), (0, -1)))
+BISHOP_RAYS = _init_rays(((1, 1), (-1, 1), (-1, -1), (1, -1)))
+ROOK_BETWEEN = _init_between(ROOK_RAYS)
+BISHOP_BETWEEN = _init_between(BISHOP_RAYS)
+
+
+def _get_targets(figure_type, color, square, occupied):
+    """
+    Return squares attacked by figure, sliding figures stop on occupied
+    square.
+    """
+    if figure_type == figures.figure.KING:
+        return KING_TARGETS[square]
+    if figure_type == figures.figure.KNIGHT:
+        return KNIGHT_TARGETS[square]
+    if figure_type == figures.figure.PAWN:
+        return PAWN_ATTACKS[color][square]
+
+    rays = ()
+    if figure_type != figures.figure.BISHOP:
+        rays += ROOK_RAYS[square]
+    if figure_type != figures.figure.ROOK:
+        rays += BISHOP_RAYS[square]
+    targets = []
+    for ray in rays:
+        for target in ray:
+            targets.append(target)
+            if target in occupied:
+                break
+    return targets
+
+
+def _is_attacked(square, layout, squares, color):
+    """
+    Check if square is attacked by figures of color.
+    """
+    for (figure_color, figure_type), figure_square in zip(layout, squares):
+        if figure_color != color:
+            continue
+        if figure_type in (figures.figure.KING, figures.figure.KNIGHT,
+                           figures.figure.PAWN):
+            if square in _get_targets(figure_type, color, figure_square, ()):
+                return True
+            continue
+        between = None
+        if figure_type != figures.figure.BISHOP:
+            between = ROOK_BETWEEN[figure_square].get(square)
+        if between is None and figure_type != figures.figure.ROOK:
+            between = BISHOP_BETWEEN[figure_square].get(square)
+        if between is not None and not any(
+                between_square in squares for between_square in between):
+            return True
+    return False
+
+
+def _is_canonical(white, black):
+    """
+    Check if material white v black is name of table, otherwise colors
+    are swapped.
+    """
+    return ((len(white), sum(LETTER_VALUES[letter] for letter in white), white)
+            >= (len(black), sum(LETTER_VALUES[letter] for letter in black),
+                black))
+
+
+def get_material(layout):
+    """
+    Return name of table for list of (color, figure type).
+    Returns tuple (name, swapped), swapped is True if colors must be
+    swapped to get position of table.
+    """
+    white = ''
+    black = ''
+    for letter in LETTER_ORDER:
+        for color, figure_type in layout:
+            if FIGURE_LETTERS[figure_type] == letter:
+                if color:
+                    black += letter
+                else:
+                    white += letter
+    if _is_canonical(white, black):
+        return (white + 'v' + black, False)
+    return (black + 'v' + white, True)
+
+
+def _parse_name(name):
+    """
+    Return layout of table as tuple of (color, figure type).
+    Raises ValueError for invalid name.
+    """
+    sides = name.upper().split('V')
+    if (len(sides) != 2 or
+            any(not side.startswith('K') or side.count('K') != 1 or
+                any(letter not in LETTER_FIGURES for letter in side)
+                for side in sides) or
+            len(sides[0]) + len(sides[1]) > MAX_PIECES):
+        raise ValueError("Invalid table name {}".format(name))
+    layout = tuple(
+        (color, LETTER_FIGURES[letter]) for color, side in enumerate(sides)
+        for letter in sorted(side, key=LETTER_ORDER.index))
+    if get_material(layout) != (sides[0] + 'v' + sides[1], False):
+        raise ValueError("Table {} has colors swapped".format(name))
+    return layout
+
+
+class Table:
+    """
+    Results of positions with one material set.
+    """
+
+    def __init__(self, name, data=None, offset=0):
+        self._name = name
+        self._layout = _parse_name(name)
+        self._pawns = any(figure_type == figures.figure.PAWN for _, figure_type
+                          in self._layout)
+        # White king is on 32 (with pawns) or 16 squares
+        self._kings = 32 if self._pawns else 16
+        self._data = data
+        # Values start after header of file
+        self._offset = offset
+
+    def get_name(self):
+        """
+        Return name of table.
+        """
+        return self._name
+
+    def get_layout(self):
+        """
+        Return tuple of (color, figure type) of figures in table.
+        """
+        return self._layout
+
+    def get_size(self):
+        """
+        Return number of positions in table.
+        """
+        return 2 * self._kings * 64 ** (len(self._layout) - 1)
+
+    def get_index(self, squares, player):
+        """
+        Return index of position with figures on squares in layout order
+        and player (0 is white) on move.
+        """
+        # Mirror files and without pawns also ranks
+        mask = 7 if squares[0] & 7 > 3 else 0
+        if not self._pawns and squares[0] > 31:
+            mask |= 56
+        king = squares[0] ^ mask
+        index = 0
+        for square in reversed(squares[1:]):
+            index = index * 64 + (square ^ mask)
+        index = index * self._kings + (king >> 3) * 4 + (king & 7)
+        return index * 2 + player
+
+    def get_position(self, index):
+        """
+        Return (squares, player) of position on index.
+        """
+        player = index & 1
+        index >>= 1
+        king = index % self._kings
+        index //= self._kings
+        squares = [(king >> 2) * 8 + (king & 3)]
+        for _ in self._layout[1:]:
+            squares.append(index & 63)
+            index >>= 6
+        return (tuple(squares), player)
+
+    def get_value(self, index):
+        """
+        Return stored value of position on index.
+        """
+        return self._data[self._offset + index]
+
+    def close(self):
+        """
+        Close data mapped to memory.
+        """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+def _decode_value(value):
+    """
+    Return (result, plies) for value stored in table.
+    """
+    if not value:
+        return (DRAW, 0)
+    plies = value - 1
+    return (WIN if plies % 2 else LOSS, plies)
+
+
+class Tablebase:
+    """
+    Tables of one directory loaded on first probe.
+    """
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._tables = {}
+
+    def __getstate__(self):
+        # Mapped tables are opened again in other process
+        return {'_directory': self._directory, '_tables': {}}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Close all loaded tables.
+        """
+        for table in self._tables.values():
+            if table is not None:
+                table.close()
+        self._tables = {}
+
+    def get_path(self, name):
+        """
+        Return path of table file.
+        """
+        return os.path.join(self._directory, name + SUFFIX)
+
+    def get_table(self, name):
+        """
+        Return table with name or None if there is no such file.
+        """
+        if name not in self._tables:
+            table = None
+            path = self.get_path(name)
+            if os.path.exists(path):
+                with open(path, 'rb') as table_file:
+                    data = mmap.mmap(table_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+                if data[:len(MAGIC)] != MAGIC:
+                    data.close()
+                    raise ValueError("Invalid table file {}".format(path))
+                table = Table(name, data, len(MAGIC))
+                logging.info("Table %s loaded from %s", name, path)
+            self._tables[name] = table
+        return self._tables[name]
+
+    def add_table(self, table):
+        """
+        Add table built in memory.
+        """
+        self._tables[table.get_name()] = table
+
+    def probe_figures(self, figure_list, player):
+        """
+        Return value of position with figures as list of (color, figure
+        type, square) and player (0 is white) on move.
+        Returns None if there isn't table for the position.
+        """
+        name, swapped = get_material(
+            [(color, figure_type) for color, figure_type, _ in figure_list])
+        table = self.get_table(name)
+        if table is None:
+            return None
+        if swapped:
+            figure_list = [(1 - color, figure_type, square ^ 56)
+                           for color, figure_type, square in figure_list]
+            player = 1 - player
+        figure_list = sorted(
+            figure_list, key=lambda figure: (
+                figure[0], LETTER_ORDER.index(FIGURE_LETTERS[figure[1]])))
+        return table.get_value(table.get_index(
+            [square for _, _, square in figure_list], player))
+
+    def probe(self, board):
+        """
+        Return (result, plies) of position on board from the view of player
+        on move, plies is number of half-moves to mate.
+        Returns None if the position isn't in tables.
+        """
+        white = board.get_figures(figures.figure.WHITE)
+        black = board.get_figures(figures.figure.BLACK)
+        if len(white) + len(black) > MAX_PIECES or board.get_castling():
+            return None
+        player = COLORS.index(board.get_player())
+        figure_list = []
+        for color, color_figures in enumerate((white, black)):
+            for fig in color_figures:
+                x_index, y_index = fig.get_position()
+                figure_list.append(
+                    (color, fig.get_type(), y_index * 8 + x_index))
+        # Position with possible en passant isn't in tables
+        if board.get_en_passant() is not None and any(
+                color == player and figure_type == figures.figure.PAWN
+                for color, figure_type, _ in figure_list):
+            return None
+        value = self.probe_figures(figure_list, player)
+        if value is None:
+            return None
+        return _decode_value(value)
+
+
+def _generate_moves(layout, squares, player):
+    """
+    Yield (layout, squares) after every legal move of player.
+    Layout is changed by capture or promotion.
+    """
+    for index, (color, figure_type) in enumerate(layout):
+        if color != player:
+            continue
+        square = squares[index]
+        targets = []
+        if figure_type == figures.figure.PAWN:
+            step = 8 if color == 0 else -8
+            if square + step not in squares:
+                targets.append(square + step)
+                start_rank = 1 if color == 0 else 6
+                if (square >> 3 == start_rank and
+                        square + 2 * step not in squares):
+                    targets.append(square + 2 * step)
+            targets.extend(target for target in PAWN_ATTACKS[color][square]
+                           if target in squares)
+        else:
+            targets = _get_targets(figure_type, color, square, squares)
+
+        for target in targets:
+            if target in squares:
+                captured = squares.index(target)
+                if layout[captured][0] == player:
+                    continue
+                child_layout = layout[:captured] + layout[captured + 1:]
+                child_squares = squares[:captured] + squares[captured + 1:]
+                moved = index if index < captured else index - 1
+            else:
+                child_layout = layout
+                child_squares = squares
+                moved = index
+            child_squares = (child_squares[:moved] + (target,) +
+                             child_squares[moved + 1:])
+            king = child_squares[child_layout.index((player,
+                                                     figures.figure.KING))]
+            if _is_attacked(king, child_layout, child_squares, 1 - player):
+                continue
+            if figure_type == figures.figure.PAWN and target >> 3 in (0, 7):
+                for promotion in PROMOTIONS:
+                    yield (child_layout[:moved] + ((player, promotion),) +
+                           child_layout[moved + 1:], child_squares)
+            else:
+                yield (child_layout, child_squares)
+
+
+def _generate_unmoves(layout, squares, player):
+    """
+    Yield squares before every move of player, which doesn't capture
+    or promote, leading to position.
+    """
+    for index, (color, figure_type) in enumerate(layout):
+        if color != player:
+            continue
+        square = squares[index]
+        origins = []
+        if figure_type == figures.figure.PAWN:
+            step = 8 if color == 0 else -8
+            rank = square >> 3 if color == 0 else 7 - (square >> 3)
+            if rank >= 2 and square - step not in squares:
+                origins.append(square - step)
+                if rank == 3 and square - 2 * step not in squares:
+                    origins.append(square - 2 * step)
+        else:
+            origins = [origin for origin in
+                       _get_targets(figure_type, color, square, squares)
+                       if origin not in squares]
+        for origin in origins:
+            yield squares[:index] + (origin,) + squares[index + 1:]
+
+
+def _is_valid(layout, squares, player):
+    """
+    Check if position can be in game, all figures are on different squares,
+    pawns aren't on the first and last rank and oponent isn't in check.
+    """
+    if len(set(squares)) != len(squares):
+        return False
+    for (_, figure_type), square in zip(layout, squares):
+        if figure_type == figures.figure.PAWN and square >> 3 in (0, 7):
+            return False
+    king = squares[layout.index((1 - player, figures.figure.KING))]
+    return not _is_attacked(king, layout, squares, player)
+
+
+def build_table(name, tablebase):
+    """
+    Build table by retrograde analysis and save it to directory
+    of tablebase. Missing smaller tables are built first.
+    Returns built table.
+    """
+    layout = _parse_name(name)
+    # Tables reached by capture or promotion
+    for index, (color, figure_type) in enumerate(layout):
+        children = []
+        if figure_type != figures.figure.KING:
+            children.append(layout[:index] + layout[index + 1:])
+        if figure_type == figures.figure.PAWN:
+            children.extend(layout[:index] + ((color, promotion),) +
+                            layout[index + 1:] for promotion in PROMOTIONS)
+        for child in children:
+            child_name = get_material(child)[0]
+            if tablebase.get_table(child_name) is None:
+                build_table(child_name, tablebase)
+
+    start_time = time.perf_counter()
+    table = Table(name)
+    size = table.get_size()
+    values = bytearray(size)
+    valid = bytearray(size)
+    done = bytearray(size)
+    # Number of moves inside table not leading to win of oponent
+    counts = bytearray(size)
+    # Position has capture or promotion not losing
+    escapes = bytearray(size)
+    # The longest loss by capture or promotion
+    losses = bytearray(size)
+    # Positions to finalize indexed by half-moves to mate, even is loss
+    levels = collections.defaultdict(list)
+
+    for index in range(size):
+        squares, player = table.get_position(index)
+        if not _is_valid(layout, squares, player):
+            continue
+        valid[index] = 1
+        has_move = False
+        for child_layout, child_squares in _generate_moves(
+                layout, squares, player):
+            has_move = True
+            if child_layout == layout:
+                counts[index] += 1
+                continue
+            value = tablebase.probe_figures(
+                [(color, figure_type, square) for (color, figure_type), square
+                 in zip(child_layout, child_squares)], 1 - player)
+            result, plies = _decode_value(value)
+            if result == LOSS:
+                escapes[index] = 1
+                levels[plies + 1].append(index)
+            elif result == DRAW:
+                escapes[index] = 1
+            else:
+                losses[index] = max(losses[index], plies + 1)
+        if not has_move:
+            king = squares[layout.index((player, figures.figure.KING))]
+            if _is_attacked(king, layout, squares, 1 - player):
+                levels[0].append(index)
+            else:
+                # Stalemate
+                done[index] = 1
+        elif not counts[index] and not escapes[index]:
+            levels[losses[index]].append(index)
+
+    plies = 0
+    longest = 0
+    while levels:
+        for index in levels.pop(plies, ()):
+            if done[index]:
+                continue
+            done[index] = 1
+            values[index] = plies + 1
+            longest = plies
+            squares, player = table.get_position(index)
+            for previous in _generate_unmoves(layout, squares, 1 - player):
+                previous = table.get_index(previous, 1 - player)
+                if done[previous] or not valid[previous]:
+                    continue
+                # Player on move is mated, previous position is won
+                if not plies % 2:
+                    levels[plies + 1].append(previous)
+                    continue
+                counts[previous] -= 1
+                if not counts[previous] and not escapes[previous]:
+                    levels[max(plies + 1, losses[previous])].append(previous)
+        plies += 1
+
+    table = Table(name, bytes(values))
+    tablebase.add_table(table)
+    with open(tablebase.get_path(name), 'wb') as table_file:
+        table_file.write(MAGIC)
+        table_file.write(values)
+    logging.info("Table %s built in %.3fs, the longest mate %s half-moves",
+                 name, time.perf_counter() - start_time, longest)
+    return table
+
+
+def prepare_parser():
+    """
+    Prepare parser for argument parsing.
+    """
+    parser = argparse.ArgumentParser(
+        description='Build endgame tables or probe position.')
+    parser.add_argument(
+        'tables',
+        nargs='*',
+        help='Names of tables to build, for example KQvK KPvK KBNvK.')
+    parser.add_argument(
+        '-d',
+        metavar='directory',
+        default='.',
+        help='Directory of tables. Default is current directory.')
+    parser.add_argument(
+        '-s',
+        metavar='FEN',
+        help='Print result of position in FEN.')
+
+    return parser
+
+
+def main():
+    """
+    Main function.
+    """
+    logging.basicConfig(
+        format='[%(asctime)s] ' +
+        '{%(pathname)s:%(lineno)d} %(levelname)s - %(message)s',
+        level=logging.INFO)
+    args = prepare_parser().parse_args()
+    os.makedirs(args.d, exist_ok=True)
+    with Tablebase(args.d) as tablebase:
+        for name in args.tables:
+            build_table(name, tablebase)
+        if args.s:
+            entry = tablebase.probe(Board.from_fen(args.s))
+            if entry is None:
+                print('Position is not in tables')
+            else:
+                result, plies = entry
+                print('Result: ' + {WIN: 'win', DRAW: 'draw',
+                                    LOSS: 'loss'}[result])
+                print('Half-moves to mate: ' + str(plies))
+
+
+if __name__ == "__main__":
+    main()